@@ -2,8 +2,16 @@
 # Team Member 1: Base Structure
 # ==================================================
 import tkinter as tk
+from concurrent.futures.process import BrokenProcessPool
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageEnhance
+from PIL import Image, ImageTk
+import image_engine
+
+FILMSTRIP_PADDING = 8   # Space around each thumbnail in the filmstrip
+FILMSTRIP_PRELOAD = 10  # Thumbnails requested beyond each edge of the visible part of the filmstrip
+MEMORY_REFRESH_MS = 1000  # How often a crop window's memory readout is updated
+HISTOGRAM_HEIGHT = 100    # Height of a crop window's histogram, in pixels (it is 256 wide, one column per value)
+HISTOGRAM_COLOURS = {"R": "red", "G": "green", "B": "blue"}  # Line colour per channel; other channels are gray
 
 class ImageEditor(tk.Tk):
     def __init__(self):
@@ -11,8 +19,12 @@ class ImageEditor(tk.Tk):
         self.title("Image Editor - CDU CAS/DAN Group 37")
 
         # Image variables
-        self.original_image = None  # Stores the original image loaded by the user
-        self.display_image = None   # Stores the resized image displayed on the canvas
+        self.source = None          # Stores the loaded image file (full resolution is decoded on demand)
+        self.pyramid = None         # Multi-resolution pyramid of the original image used for display
+        self.viewport = None        # Zoom and pan of the image on the canvas
+        self.tiles = None           # Renders (and caches) the visible tiles of the image
+        self.visible_tiles = []     # PhotoImages of the tiles currently on the canvas
+        self.full_resolution_pending = False  # True while the full-resolution image is decoding for zoom
         self.image_path = None      # Stores the file path of the loaded image
         self.cropped_image = None   # Stores the cropped image (as a PhotoImage object)
         self.cropped_image_data = None  # Stores the cropped image (as a PIL image object)
@@ -29,9 +41,57 @@ class ImageEditor(tk.Tk):
         self.load_button = tk.Button(self, text="Load Image", command=self.load_image)
         self.load_button.pack()
 
+        # Open Folder Button: shows the folder's images as a filmstrip of thumbnails
+        self.folder_button = tk.Button(self, text="Open Folder", command=self.open_folder)
+        self.folder_button.pack()
+
+        # Open Session Button: reopens a crop window saved with "Save Session"
+        self.session_button = tk.Button(self, text="Open Session", command=self.open_session)
+        self.session_button.pack()
+
+        # Status text for background work (loading, saving)
+        self.status_text = tk.Label(self, text="", font=("Sans", 10))
+        self.status_text.pack()
+
+        # Worker threads for decoding and saving; results come back through after()
+        self.jobs = image_engine.JobExecutor(self)
+
+        # One memory budget for the edit histories and results of all crop windows
+        self.memory = image_engine.MemoryManager()
+
+        # Filter plugins (built-in and from G37_FILTER_DIR); each gets a button in the crop window
+        filter_errors = image_engine.discover_filters()
+        if filter_errors:
+            self.show_status("Filters not loaded: " + ", ".join(sorted(filter_errors)))
+
+        # Folder filmstrip; it is only shown once a folder has been opened
+        self.thumbnails = image_engine.ThumbnailGenerator()  # Worker processes and the on-disk thumbnail cache
+        self.filmstrip_paths = []       # Image files of the open folder, in filmstrip order
+        self.filmstrip_photos = {}      # Index -> PhotoImage of each thumbnail loaded so far
+        self.filmstrip_jobs = {}        # Index -> Job of each thumbnail requested so far
+        self.filmstrip = tk.Canvas(self, height=image_engine.THUMBNAIL_SIZE + 2 * FILMSTRIP_PADDING)
+        self.filmstrip_scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.on_filmstrip_scroll)
+        self.filmstrip.config(xscrollcommand=self.filmstrip_scrollbar.set)
+        self.filmstrip.bind("<Button-1>", self.on_filmstrip_click)
+        self.filmstrip.bind("<Configure>", lambda event: self.load_visible_thumbnails())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.filmstrip.bind(sequence, self.on_filmstrip_wheel)
+        self.bind("<Destroy>", self.on_destroy, add="+")
+
         # For cropping functionality
         self.crop_rectangle = None  # Stores the rectangle drawn for cropping
         self.crop_start_x = self.crop_start_y = 0  # Stores the starting coordinates of the crop rectangle
+        self.crop_box = None  # Stores the latest crop box in full-resolution pixels
+        self.pan_start = (0, 0)  # Stores the last mouse position while panning
+
+        # Mouse motion arrives far more often than the screen refreshes; handle at most one event per frame
+        self.selection_throttle = image_engine.FrameThrottle(self, self.update_selection)
+        self.pan_throttle = image_engine.FrameThrottle(self, self.update_pan)
+
+        # Follow window resizes: a fast render per frame while resizing, full quality once the size settles
+        self.resize_throttle = image_engine.FrameThrottle(self, self.refit_view)
+        self.refine_timer = None
+        self.canvas.bind("<Configure>", self.on_canvas_configure)
 
         # Bind keyboard shortcuts
         self.bind("<Control-o>", self.load_image_shortcut)
@@ -50,42 +110,331 @@ class ImageEditor(tk.Tk):
         if not file_path:
             messagebox.showerror("Error", "No file selected.")
             return
-        try:
-            self.original_image = Image.open(file_path)
-        except Exception as e:
+        self.open_image_file(file_path)
+
+    def open_image_file(self, file_path):
+        """
+        Decodes an image file in the background and displays it on the canvas.
+        - file_path: The image file, chosen in the file dialog or the filmstrip.
+        """
+        canvas_width, canvas_height = self.canvas.winfo_width(), self.canvas.winfo_height()
+
+        def decode(job):
+            # Runs on a worker thread. Decode only a display-sized preview now;
+            # the full image is decoded when a crop needs it
+            source = image_engine.SourceImage(file_path)
+            job.report(0.1)
+            preview = source.preview(canvas_width, canvas_height)
+            job.check()
+            job.report(0.6)
+            # Build the pyramid levels the fitted view draws from here, not lazily on the UI thread
+            pyramid = image_engine.ImagePyramid(preview)
+            pyramid.level_for(image_engine.fit_size(source.size, canvas_width, canvas_height))
+            return file_path, source, pyramid
+
+        def on_error(e):
+            self.show_status("")
             messagebox.showerror("Error", f"Failed to load image: {e}")
-            return
-        self.image_path = file_path
 
-        # Rescale the image to fit within the canvas while maintaining aspect ratio
-        self.display_image = self.resize_to_fit(self.original_image, self.canvas.winfo_width(), self.canvas.winfo_height())
+        # A newer load cancels one that is still running
+        self.show_status("Loading image...")
+        self.jobs.submit(decode, key="load", on_done=self.show_loaded_image, on_error=on_error,
+                         on_progress=lambda fraction: self.show_status(f"Loading image... {fraction:.0%}"))
 
-        # Display the scaled image on the canvas
-        self.canvas.delete("all")
-        self.canvas.image = self.display_image  # Keep a reference to avoid garbage collection
-        self.canvas.create_image(self.canvas.winfo_width()//2, self.canvas.winfo_height()//2, anchor=tk.CENTER, image=self.display_image)
+    def show_loaded_image(self, result):
+        """
+        Displays an image decoded by load_image; runs on the UI thread once decoding has finished.
+        - result: The (file_path, source, pyramid) produced by the decode job.
+        """
+        file_path, self.source, self.pyramid = result
+        self.image_path = file_path
+        self.show_status("")
+
+        # Fit the image within the canvas while maintaining aspect ratio; only the visible tiles are rendered
+        self.viewport = image_engine.Viewport(self.source.size, (self.canvas.winfo_width(), self.canvas.winfo_height()))
+        self.tiles = image_engine.TileRenderer(self.pyramid, self.source.size, convert=ImageTk.PhotoImage)
+        self.full_resolution_pending = False
 
         # Reset cropping rectangle
+        self.canvas.delete("all")
         self.crop_rectangle = None
+        self.render_view()
 
         # Set up mouse event for cropping
         self.canvas.bind("<ButtonPress-1>", self.on_mouse_press)
         self.canvas.bind("<B1-Motion>", self.on_mouse_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_mouse_release)
 
-    def resize_to_fit(self, image, max_width, max_height):
+        # Mouse wheel zooms, right (or middle) button drag pans
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-5>", self.on_mouse_wheel)
+        for button in (2, 3):
+            self.canvas.bind(f"<ButtonPress-{button}>", self.on_pan_start)
+            self.canvas.bind(f"<B{button}-Motion>", self.on_pan_drag)
+
+    def render_view(self, resample=image_engine.QUALITY_RESAMPLE):
+        """
+        Draws the tiles of the image that are visible at the current zoom and pan.
+        - Tiles are rendered from the pyramid and cached, so panning back over an area costs nothing.
+        - Zooming in past the preview's resolution starts decoding the full-resolution image in the background.
+        - resample: The filter for tiles that are not cached yet; FAST_RESAMPLE while the view is changing.
+        """
+        with image_engine.span("draw.tiles", "draw", zoom=self.viewport.zoom) as trace:
+            self.canvas.delete("tile")
+            self.visible_tiles = []  # Keep references to avoid garbage collection
+            for col, row, x, y in self.viewport.visible_tiles(self.tiles.tile_size):
+                photo = self.tiles.tile(self.viewport.zoom, col, row, resample)
+                self.canvas.create_image(x, y, anchor=tk.NW, image=photo, tags="tile")
+                self.visible_tiles.append(photo)
+            self.canvas.tag_lower("tile")
+            trace.annotate(tiles=len(self.visible_tiles))
+
+        if self.tiles.needs_full_resolution(self.viewport.zoom) and not self.full_resolution_pending:
+            self.load_full_resolution()
+
+    def load_full_resolution(self):
+        """
+        Decodes the full-resolution image on a worker thread and switches the tiles over to it.
+        - If decoding fails, the preview stays in use and the error is shown.
+        """
+        source = self.source
+        self.full_resolution_pending = True
+        fitted = image_engine.fit_size(source.size, *self.viewport.canvas_size)
+
+        def decode(job):
+            # Every level from full resolution down to the fitted view is built here, so no zoom in between has to
+            # build one on the UI thread
+            pyramid = image_engine.ImagePyramid(source.full())
+            pyramid.level_for(fitted)
+            return pyramid
+
+        def on_done(pyramid):
+            if source is not self.source:
+                return  # Another image has been loaded since
+            self.pyramid = pyramid
+            self.tiles = image_engine.TileRenderer(pyramid, source.size, convert=ImageTk.PhotoImage)
+            self.render_view()
+
+        def on_error(e):
+            if source is not self.source:
+                return
+            self.full_resolution_pending = False  # The next zoom or pan tries again
+            messagebox.showerror("Error", f"Failed to load the full-resolution image: {e}")
+
+        self.jobs.submit(decode, on_done=on_done, on_error=on_error)
+
+    def on_mouse_wheel(self, event):
+        """
+        Zooms in or out around the mouse pointer.
+        """
+        zoom_in = event.num == 4 or event.delta > 0
+        old_zoom = self.viewport.zoom
+        self.viewport.zoom_at(1.25 if zoom_in else 0.8, event.x, event.y)
+        if self.crop_rectangle:
+            factor = self.viewport.zoom / old_zoom
+            self.canvas.scale(self.crop_rectangle, event.x, event.y, factor, factor)
+        self.render_view()
+
+    def on_canvas_configure(self, event):
+        """
+        Handles the canvas changing size (e.g. the window being resized); refits at most once per frame.
+        """
+        if self.viewport and (event.width, event.height) != self.viewport.canvas_size:
+            self.resize_throttle.submit(event.width, event.height)
+
+    def refit_view(self, width, height):
+        """
+        Fits the view to the new canvas size with a fast filter, and schedules a full-quality render for when the
+        size stops changing.
+        - Tiles are cached per zoom, so returning to an earlier window size reuses the tiles rendered for it.
+        """
+        if self.crop_rectangle:
+            # Keep the selection on the same part of the image
+            x1, y1, x2, y2 = self.canvas.coords(self.crop_rectangle)
+            corners = self.viewport.canvas_to_image(x1, y1), self.viewport.canvas_to_image(x2, y2)
+        self.viewport.resize_canvas((width, height))
+        if self.crop_rectangle:
+            self.canvas.coords(self.crop_rectangle, *self.viewport.image_to_canvas(*corners[0]),
+                               *self.viewport.image_to_canvas(*corners[1]))
+        self.render_view(image_engine.FAST_RESAMPLE)
+
+        if self.refine_timer is not None:
+            self.after_cancel(self.refine_timer)
+        self.refine_timer = self.after(image_engine.RESIZE_SETTLE_MS, self.refine_view)
+
+    def refine_view(self):
+        """
+        Re-renders the view at full quality once the window size has settled.
+        """
+        self.refine_timer = None
+        self.render_view()
+
+    def on_pan_start(self, event):
+        """
+        Records where a pan drag started.
+        """
+        self.pan_start = (event.x, event.y)
+
+    def on_pan_drag(self, event):
+        """
+        Moves the image with the mouse while panning (at most once per frame).
+        """
+        self.pan_throttle.submit(event.x, event.y)
+
+    def update_pan(self, x, y):
+        """
+        Moves the image to follow the latest pan position.
+        """
+        dx, dy = x - self.pan_start[0], y - self.pan_start[1]
+        self.pan_start = (x, y)
+        self.viewport.pan(dx, dy)
+        if self.crop_rectangle:
+            self.canvas.move(self.crop_rectangle, dx, dy)
+        self.render_view()
+
+    def show_status(self, text):
+        """
+        Shows a short status message (e.g. progress of background work) below the buttons.
+        """
+        self.status_text.config(text=text)
+
+    @property
+    def original_image(self):
+        """
+        The original full-resolution image; it is decoded from disk the first time it is needed.
+        """
+        return self.source.full() if self.source else None
+
+    def open_session(self):
+        """
+        Restores a crop window saved with "Save Session".
+        - The source image is checked against the hash stored in the session, and the saved result is shown directly
+          without replaying the edits.
+        """
+        session_path = filedialog.askopenfilename(filetypes=[("G37 sessions", "*" + image_engine.SESSION_EXTENSION)])
+        if not session_path:
+            return
+
+        def on_done(result):
+            self.show_status("")
+            engine, source_path, crop_box = result
+            self.cropped_image_data = engine.image
+            self.cropped_image = ImageTk.PhotoImage(self.cropped_image_data)
+            self.open_crop_window(engine=engine, origin=(source_path, crop_box))
+
+        def on_error(e):
+            self.show_status("")
+            messagebox.showerror("Error", f"Failed to open session: {e}")
+
+        self.show_status("Opening session...")
+        self.jobs.submit(lambda job: image_engine.restore_session(session_path, memory=self.memory),
+                         on_done=on_done, on_error=on_error)
+
+# ==================================================
+# Folder Filmstrip
+# ==================================================
+    def open_folder(self):
+        """
+        Shows the images of a folder as a scrollable strip of thumbnails; clicking one loads it.
+        - Thumbnails are generated in worker processes and kept in an on-disk cache, so a folder seen before
+          fills in almost immediately.
+        - Only the thumbnails scrolled into view (and a few either side) are requested.
+        """
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        try:
+            paths = image_engine.list_images(folder)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to open folder: {e}")
+            return
+
+        # Forget the previous folder, including thumbnails still queued for it
+        for job in self.filmstrip_jobs.values():
+            job.cancel()
+        self.filmstrip_paths = paths
+        self.filmstrip_photos = {}
+        self.filmstrip_jobs = {}
+
+        slot = image_engine.THUMBNAIL_SIZE + FILMSTRIP_PADDING
+        self.filmstrip.delete("all")
+        for index in range(len(paths)):
+            x = FILMSTRIP_PADDING + index * slot
+            self.filmstrip.create_rectangle(x, FILMSTRIP_PADDING, x + image_engine.THUMBNAIL_SIZE,
+                                            FILMSTRIP_PADDING + image_engine.THUMBNAIL_SIZE,
+                                            outline="gray", tags=f"slot{index}")
+        self.filmstrip.config(scrollregion=(0, 0, FILMSTRIP_PADDING + len(paths) * slot, 0))
+        self.filmstrip.xview_moveto(0)
+        if not self.filmstrip.winfo_ismapped():
+            self.filmstrip.pack(fill="x", before=self.contributors_text)
+            self.filmstrip_scrollbar.pack(fill="x", before=self.contributors_text)
+        self.show_status(f"{len(paths)} images in {folder}")
+        self.load_visible_thumbnails()
+
+    def on_filmstrip_scroll(self, *args):
         """
-        Resizes an image to fit within the given dimensions while maintaining its aspect ratio.
-        - image: The PIL image object to resize.
-        - max_width: The maximum width for the resized image.
-        - max_height: The maximum height for the resized image.
-        - Returns: A PhotoImage object for display on the canvas.
+        Scrolls the filmstrip from its scrollbar and requests the thumbnails that came into view.
         """
-        img_width, img_height = image.size
-        ratio = min(max_width / img_width, max_height / img_height)
-        new_width = int(img_width * ratio)
-        new_height = int(img_height * ratio)
-        return ImageTk.PhotoImage(image.resize((new_width, new_height), Image.LANCZOS))
+        self.filmstrip.xview(*args)
+        self.load_visible_thumbnails()
+
+    def on_filmstrip_wheel(self, event):
+        """
+        Scrolls the filmstrip with the mouse wheel.
+        """
+        self.filmstrip.xview_scroll(-3 if event.num == 4 or event.delta > 0 else 3, "units")
+        self.load_visible_thumbnails()
+
+    def load_visible_thumbnails(self):
+        """
+        Requests the thumbnails in view (plus a margin) that have not been requested yet.
+        """
+        if not self.filmstrip_paths:
+            return
+        slot = image_engine.THUMBNAIL_SIZE + FILMSTRIP_PADDING
+        left = self.filmstrip.canvasx(0)
+        right = self.filmstrip.canvasx(self.filmstrip.winfo_width())
+        first = max(0, int(left // slot) - FILMSTRIP_PRELOAD)
+        last = min(len(self.filmstrip_paths), int(right // slot) + 1 + FILMSTRIP_PRELOAD)
+        paths = self.filmstrip_paths
+        for index in range(first, last):
+            if index in self.filmstrip_jobs:
+                continue
+            future = self.thumbnails.submit(paths[index])
+            self.filmstrip_jobs[index] = self.jobs.watch(
+                future, on_done=lambda thumbnail, index=index: self.show_thumbnail(paths, index, thumbnail),
+                on_error=lambda e, index=index: self.thumbnail_failed(paths, index, e))
+
+    def thumbnail_failed(self, paths, index, error):
+        """
+        Handles a thumbnail that could not be made. A file that cannot be decoded keeps its empty slot; one lost
+        because a worker process died is requested again the next time its slot scrolls into view.
+        """
+        if paths is self.filmstrip_paths and isinstance(error, BrokenProcessPool):
+            self.filmstrip_jobs.pop(index, None)
+
+    def show_thumbnail(self, paths, index, thumbnail):
+        """
+        Places a generated thumbnail in its filmstrip slot.
+        - paths: The folder listing the thumbnail was requested for; it is ignored if another folder is open now.
+        """
+        if paths is not self.filmstrip_paths:
+            return
+        with Image.open(thumbnail) as image:
+            photo = ImageTk.PhotoImage(image)
+        self.filmstrip_photos[index] = photo  # Keep a reference to avoid garbage collection
+        x = FILMSTRIP_PADDING + index * (image_engine.THUMBNAIL_SIZE + FILMSTRIP_PADDING)
+        self.filmstrip.create_image(x + image_engine.THUMBNAIL_SIZE // 2,
+                                    FILMSTRIP_PADDING + image_engine.THUMBNAIL_SIZE // 2, image=photo)
+
+    def on_filmstrip_click(self, event):
+        """
+        Loads the image whose thumbnail was clicked.
+        """
+        index = int(self.filmstrip.canvasx(event.x) // (image_engine.THUMBNAIL_SIZE + FILMSTRIP_PADDING))
+        if 0 <= index < len(self.filmstrip_paths):
+            self.open_image_file(self.filmstrip_paths[index])
 
 # ==================================================
 # Team Member 3: Image Cropping Functionality
@@ -105,119 +454,220 @@ class ImageEditor(tk.Tk):
     def on_mouse_drag(self, event):
         """
         Handles the mouse drag event for cropping.
-        - Updates the coordinates of the crop rectangle as the user drags the mouse.
+        - Updates the coordinates of the crop rectangle as the user drags the mouse, at most once per frame.
         """
-        self.canvas.coords(self.crop_rectangle, self.crop_start_x, self.crop_start_y, event.x, event.y)
+        self.selection_throttle.submit(event.x, event.y)
+
+    def update_selection(self, x, y):
+        """
+        Moves the corner of the crop rectangle and shows the selection size in source pixels.
+        """
+        self.canvas.coords(self.crop_rectangle, self.crop_start_x, self.crop_start_y, x, y)
+        left, upper, right, lower = self.viewport.crop_box((self.crop_start_x, self.crop_start_y), (x, y))
+        self.show_status(f"Selection: {right - left} x {lower - upper} px")
 
     def on_mouse_release(self, event):
         """
         Handles the mouse release event for cropping.
         - Calculates the cropping coordinates and crops the image.
-        - Opens a new window to display the cropped image.
+        - Opens a new window to display the cropped image. If the full-resolution image has not been decoded yet,
+          the window opens straight away with a preview cut from the displayed image.
         """
-        canvas_width, canvas_height = self.canvas.winfo_width(), self.canvas.winfo_height()
-        img_width, img_height = self.original_image.size
-        display_width, display_height = self.display_image.width(), self.display_image.height()
-        
-        scale_x = img_width / display_width
-        scale_y = img_height / display_height
-
-        # Ensure valid cropping coordinates
-        x1 = max(0, min(self.crop_start_x, event.x))
-        y1 = max(0, min(self.crop_start_y, event.y))
-        x2 = max(0, max(self.crop_start_x, event.x))
-        y2 = max(0, max(self.crop_start_y, event.y))
-
-        # Calculate the offset to center the image on the canvas
-        offset_x = (canvas_width - display_width) // 2
-        offset_y = (canvas_height - display_height) // 2
-
-        # Adjust coordinates based on the offset
-        x1 = max(0, x1 - offset_x)
-        y1 = max(0, y1 - offset_y)
-        x2 = min(display_width, x2 - offset_x)
-        y2 = min(display_height, y2 - offset_y)
-
-        crop_box = (
-            int(x1 * scale_x),
-            int(y1 * scale_y),
-            int(x2 * scale_x),
-            int(y2 * scale_y)
-        )
-
-        self.cropped_image_data = self.original_image.crop(crop_box)
-        self.cropped_image = ImageTk.PhotoImage(self.cropped_image_data)
-
-        self.open_crop_window()
-
-    def open_crop_window(self):
+        self.selection_throttle.cancel()
+        self.show_status("")
+
+        # The viewport maps canvas coordinates back to full resolution through any zoom and pan
+        crop_box = self.viewport.crop_box((self.crop_start_x, self.crop_start_y), (event.x, event.y))
+        if crop_box[2] - crop_box[0] < 1 or crop_box[3] - crop_box[1] < 1:
+            return  # A click without a drag selects nothing
+        self.crop_box = crop_box
+
+        if self.source.full_loaded:
+            self.cropped_image_data = self.source.crop(crop_box)  # A view into the full image, not a copy
+            full_crop_box = None
+        else:
+            self.cropped_image_data = self.pyramid.crop(crop_box, self.source.size)
+            full_crop_box = crop_box  # Decoded in the background once the window is open
+        with image_engine.span("convert.photoimage", "convert", self.cropped_image_data):
+            self.cropped_image = ImageTk.PhotoImage(self.cropped_image_data)
+
+        self.open_crop_window(full_crop_box)
+
+    def open_crop_window(self, full_crop_box=None, engine=None, origin=None):
         """
         Opens a new window to display the cropped image and provide editing options.
         - Includes sliders for resizing and brightness adjustment.
         - Includes buttons for grayscale conversion, rotation, and saving.
+        - Shows a live histogram with per-channel minimum, maximum and mean beside the image.
+        - full_crop_box: If the window opens with a preview, the region to crop from the full-resolution image in the
+          background; edits made on the preview are replayed onto it when it arrives.
+        - engine: An EditEngine to continue (e.g. from a restored session); by default a new one is started.
+        - origin: The (source image path, crop box) the crop came from, recorded by "Save Session".
         """
+        origin = origin or (self.image_path, self.crop_box)
         crop_window = tk.Toplevel(self)
         crop_window.title("Cropped Image")
 
-        # Canvas for cropped image
-        crop_canvas = tk.Canvas(crop_window, width=400, height=300)
-        crop_canvas.pack(fill="both", expand=True)
+        # Canvas for cropped image, with the histogram and statistics panel beside it
+        view_frame = tk.Frame(crop_window)
+        view_frame.pack(fill="both", expand=True)
+        stats_panel = tk.Frame(view_frame)
+        stats_panel.pack(side="right", fill="y")
+        crop_canvas = tk.Canvas(view_frame, width=400, height=300)
+        crop_canvas.pack(side="left", fill="both", expand=True)
 
-        # Display cropped image
+        # Display cropped image; edits update this one canvas item and its PhotoImage in place
         crop_canvas.image = self.cropped_image  # Keep a reference to avoid garbage collection
-        crop_canvas.create_image(0, 0, anchor=tk.NW, image=self.cropped_image)
+        crop_canvas.image_mode = self.cropped_image_data.mode  # A PhotoImage keeps the mode it was created with
+        crop_item = crop_canvas.create_image(0, 0, anchor=tk.NW, image=self.cropped_image)
+
+        # Edit engine holding the undo/redo history for the cropped image
+        if engine is None:
+            engine = image_engine.EditEngine(self.cropped_image_data, memory=self.memory)
+
+        # One worker thread per crop window, so edits run in the order they were made
+        edit_jobs = image_engine.JobExecutor(self, max_workers=1)
+        edit_status = tk.Label(crop_window, text="")
+        memory_status = tk.Label(crop_window, text="")
+
+        # Histogram and per-channel statistics, from a sample of the pixels unless exact ones were asked for
+        histogram = image_engine.LiveHistogram()
+        histogram_canvas = tk.Canvas(stats_panel, width=256, height=HISTOGRAM_HEIGHT, bg="white")
+        histogram_canvas.pack()
+        histogram_canvas.lines = {}  # Channel -> line item, moved with coords() on each update
+        stats_label = tk.Label(stats_panel, text="", justify="left", font="TkFixedFont")
+        stats_label.pack()
+
+        def show_stats(stats):
+            """
+            Draws the histogram as one line per channel and lists its minimum, maximum and mean.
+            """
+            peak = max(1, int(stats.counts.max()))
+            for band, line in list(histogram_canvas.lines.items()):
+                if band not in stats.bands:
+                    histogram_canvas.delete(line)
+                    del histogram_canvas.lines[band]
+            for band, counts in zip(stats.bands, stats.counts):
+                points = []
+                for value, count in enumerate(counts.tolist()):
+                    points += [value, HISTOGRAM_HEIGHT - count * HISTOGRAM_HEIGHT / peak]
+                line = histogram_canvas.lines.get(band)
+                if line is None:
+                    histogram_canvas.lines[band] = histogram_canvas.create_line(
+                        *points, fill=HISTOGRAM_COLOURS.get(band, "gray"))
+                else:
+                    histogram_canvas.coords(line, *points)
+            source = "exact" if stats.exact else f"sampled from {stats.pixels:,} pixels"
+            stats_label.config(text=f"{stats.summary()}\n({source})")
+
+        def show_exact_stats():
+            """
+            Counts every pixel of the current image on the worker thread, after any edits still running.
+            """
+            edit_status.config(text="Counting pixels...")
+
+            def on_done(stats):
+                if not edit_jobs.busy:
+                    edit_status.config(text="")
+                show_stats(stats)
+            edit_jobs.submit(lambda job: histogram.exact(engine.image), on_done=on_done)
+
+        tk.Button(stats_panel, text="Exact Statistics", command=show_exact_stats).pack()
 
-        # Undo/Redo stacks for cropped image
-        undo_stack = []
-        redo_stack = []
-        original_cropped_image = self.cropped_image_data.copy()
+        def refresh_memory_status():
+            memory_status.config(text=self.memory.usage_text(engine))
+            memory_status.timer = crop_window.after(MEMORY_REFRESH_MS, refresh_memory_status)
+
+        def stop_edit_jobs(event):
+            if event.widget is crop_window:
+                edit_jobs.shutdown()
+                crop_window.after_cancel(memory_status.timer)
+        crop_window.bind("<Destroy>", stop_edit_jobs, add="+")
 
 # ==================================================
 # Team Member 4: Image Processing & Enhancements
 # ==================================================
-        def apply_edit(edit_func):
+        def run_edit(func, key=None, then=None, failed=None):
+            """
+            Runs engine work on the crop window's worker thread and shows the resulting image when it is done.
+            - func: A function returning the new image, or None if nothing changed.
+            - key: Optional key; a newer job with the same key supersedes this one.
+            - then: Optional function called on the UI thread after the result is shown.
+            - failed: Optional function called on the UI thread with the error if func raised.
+            """
+            def work(job):
+                # The engine is only touched on its worker thread, so read the statistics there too
+                image = func()
+                return image, histogram.update(engine) if image is not None else None
+
+            def on_done(result):
+                image, stats = result
+                if not edit_jobs.busy:
+                    edit_status.config(text="")
+                if image is not None:
+                    self.cropped_image_data = image
+                    update_crop_display()
+                    show_stats(stats)
+                if then:
+                    then()
+
+            def on_error(e):
+                if failed:
+                    failed(e)
+                if not crop_window.winfo_exists():
+                    return
+                edit_status.config(text="")
+                messagebox.showerror("Error", f"Failed to edit image: {e}", parent=crop_window)
+
+            edit_status.config(text="Processing...")
+            edit_jobs.submit(work, key=key, on_done=on_done, on_error=on_error)
+
+        def apply_edit(name, key=None, **params):
             """
             Applies an edit to the cropped image and updates the display.
-            - edit_func: A function that performs the edit and returns the modified image.
+            - name: The name of the engine operation to apply.
+            - key: Optional key so a newer slider value supersedes one still waiting to render.
+            - params: Parameters passed to the operation.
             """
-            nonlocal undo_stack, redo_stack
-            undo_stack.append(self.cropped_image_data.copy())
-            redo_stack.clear()  # Clear redo stack after a new edit
-            self.cropped_image_data = edit_func()  # Apply the edit and update the cropped image
-            update_crop_display()
+            run_edit(lambda: engine.apply(name, **params), key=key)
 
         def undo_crop_edit():
             """
             Undoes the last edit applied to the cropped image.
             """
-            if undo_stack:
-                redo_stack.append(self.cropped_image_data.copy())
-                self.cropped_image_data = undo_stack.pop()
-                update_crop_display()
+            run_edit(lambda: engine.image if engine.undo() else None)
 
         def redo_crop_edit():
             """
             Redoes the last undone edit applied to the cropped image.
             """
-            if redo_stack:
-                undo_stack.append(self.cropped_image_data.copy())
-                self.cropped_image_data = redo_stack.pop()
-                update_crop_display()
+            run_edit(lambda: engine.image if engine.redo() else None)
 
         def update_crop_display():
             """
             Updates the display of the cropped image in the crop window.
+            - If the size and mode are unchanged, the image is pasted into the existing PhotoImage in place.
+            - Otherwise a new PhotoImage is swapped into the same canvas item.
             """
-            self.cropped_image = ImageTk.PhotoImage(self.cropped_image_data)
-            crop_canvas.delete("all")
-            crop_canvas.create_image(0, 0, anchor=tk.NW, image=self.cropped_image)
-            crop_canvas.image = self.cropped_image  # Keep a reference to avoid garbage collection
+            image = self.cropped_image_data
+            photo = crop_canvas.image
+            if (photo.width(), photo.height()) == image.size and crop_canvas.image_mode == image.mode:
+                with image_engine.span("convert.photoimage", "convert", image, in_place=True):
+                    photo.paste(image)
+                return
+
+            with image_engine.span("convert.photoimage", "convert", image):
+                self.cropped_image = ImageTk.PhotoImage(image)
+            with image_engine.span("draw.crop", "draw", image):
+                crop_canvas.itemconfigure(crop_item, image=self.cropped_image)
+                crop_canvas.image = self.cropped_image  # Keep a reference to avoid garbage collection
+                crop_canvas.image_mode = image.mode
 
         def crop_to_grayscale():
             """
             Converts the cropped image to grayscale.
             """
-            apply_edit(lambda: self.cropped_image_data.convert("L"))
+            apply_edit("grayscale")
 
         def crop_adjust_brightness(value):
             """
@@ -225,13 +675,31 @@ class ImageEditor(tk.Tk):
             - value: The brightness factor (0.1 to 2.0).
             """
             factor = float(value)
-            apply_edit(lambda: ImageEnhance.Brightness(original_cropped_image).enhance(factor))
+
+            def adjust():
+                # Setting the slider also reports its value; that must not record an edit
+                if engine.adjustments.get("brightness", 1.0) == factor:
+                    return None
+                return engine.adjust(brightness=factor)
+            run_edit(adjust, key="brightness")
 
         def crop_rotate_image():
             """
             Rotates the cropped image by 90 degrees.
             """
-            apply_edit(lambda: self.cropped_image_data.rotate(90, expand=True))
+            run_edit(lambda: engine.rotate(90))
+
+        def crop_apply_filter(name):
+            """
+            Applies a filter plugin, with its default settings, to the cropped image.
+            """
+            run_edit(lambda: engine.filter(name))
+
+        def crop_flip_image(horizontal):
+            """
+            Mirrors the cropped image left-right (horizontal=True) or top-bottom.
+            """
+            run_edit(lambda: engine.flip(horizontal))
 
         def crop_resize_image(value):
             """
@@ -239,46 +707,197 @@ class ImageEditor(tk.Tk):
             - value: The resize factor (0.1 to 2.0).
             """
             factor = float(value)
-            apply_edit(lambda: original_cropped_image.resize(
-                (int(original_cropped_image.width * factor),
-                 int(original_cropped_image.height * factor)),
-                Image.LANCZOS))
+
+            def resize():
+                if round(engine.scale, 1) == factor:  # The slider moves in steps of 0.1
+                    return None
+                return engine.resize(factor)
+            run_edit(resize, key="resize")
+
+        def waiting_for_full_crop(retry):
+            """
+            Returns True if a save has to wait for, or give up on, the full-resolution crop.
+            - retry: Called again every 100 ms while the crop is still loading.
+            - Gives up, with an error, if the crop failed, and silently if the window was closed meanwhile.
+            """
+            if not crop_window.winfo_exists():
+                self.show_status("")
+                return True
+            if full_crop_error is not None:
+                self.show_status("")
+                messagebox.showerror("Error", f"Cannot save: the full-resolution image failed to load: "
+                                              f"{full_crop_error}", parent=crop_window)
+                return True
+            if full_crop_pending:
+                self.show_status("Waiting for the full-resolution crop...")
+                # Scheduled on the main window, so a retry still runs (and stops) after the crop window closes
+                self.after(100, retry)
+                return True
+            return False
 
         def save_cropped_image():
             """
             Saves the cropped image to the user's local device.
             """
-            if not self.cropped_image_data:
+            if not engine.image:
                 messagebox.showerror("Error", "No cropped image to save.")
                 return
             save_path = filedialog.asksaveasfilename(defaultextension=".png",
-                                                     filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg")],
+                                                     filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"),
+                                                                ("WebP files", "*.webp")],
                                                      parent=crop_window)
             if save_path:
-                try:
-                    self.cropped_image_data.save(save_path, quality=95)
+                save_to(save_path, save_preset.get())
+
+        def save_to(save_path, preset):
+            """
+            Encodes the edited image to save_path on the crop window's worker, after any edits still running and
+            once the full-resolution crop is in place.
+            """
+            if waiting_for_full_crop(lambda: save_to(save_path, preset)):
+                return
+
+            # The crop window may have been closed while the image was saving
+            def on_done(result):
+                self.show_status(f"Saved {result['bytes'] / 1024:,.0f} KB in {result['encode_ms']:.0f} ms")
+                if crop_window.winfo_exists():
                     messagebox.showinfo("Success", "Image saved successfully by G37 Image Editor ", parent=crop_window)
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to save image: {e}")
+
+            def on_error(e):
+                self.show_status("")
+                messagebox.showerror("Error", f"Failed to save image: {e}",
+                                     parent=crop_window if crop_window.winfo_exists() else self)
+
+            # Encode on the crop window's worker, so the image saved is the one after every queued edit
+            self.show_status("Saving image...")
+            edit_jobs.submit(lambda job: image_engine.save_image(engine.image, save_path, preset),
+                             on_done=on_done, on_error=on_error)
 
         # Buttons for editing cropped image
         tk.Button(crop_window, text="Grayscale", command=crop_to_grayscale).pack()
         tk.Button(crop_window, text="Rotate", command=crop_rotate_image).pack()
+        tk.Button(crop_window, text="Flip Horizontal", command=lambda: crop_flip_image(True)).pack()
+        tk.Button(crop_window, text="Flip Vertical", command=lambda: crop_flip_image(False)).pack()
+
+        # One button per filter plugin, in a row
+        filter_bar = tk.Frame(crop_window)
+        for plugin in image_engine.available_filters():
+            button = tk.Button(filter_bar, text=plugin.label, command=lambda name=plugin.name: crop_apply_filter(name))
+            button.pack(side="left")
+        filter_bar.pack()
         tk.Button(crop_window, text="Save", command=save_cropped_image).pack()
+
+        def save_session_file():
+            """
+            Saves the crop and its edit history to a session file that "Open Session" can restore.
+            """
+            session_path = filedialog.asksaveasfilename(defaultextension=image_engine.SESSION_EXTENSION,
+                                                        filetypes=[("G37 sessions", "*" + image_engine.SESSION_EXTENSION)],
+                                                        parent=crop_window)
+            if session_path:
+                write_session(session_path)
+
+        def write_session(session_path):
+            """
+            Writes the session on the crop window's worker, after any edits still running.
+            """
+            if waiting_for_full_crop(lambda: write_session(session_path)):
+                return
+
+            def on_done(nbytes):
+                self.show_status(f"Session saved ({nbytes / 1024:,.0f} KB)")
+
+            def on_error(e):
+                self.show_status("")
+                messagebox.showerror("Error", f"Failed to save session: {e}", parent=crop_window)
+
+            self.show_status("Saving session...")
+            edit_jobs.submit(lambda job: image_engine.save_session(session_path, engine, *origin),
+                             on_done=on_done, on_error=on_error)
+
+        tk.Button(crop_window, text="Save Session", command=save_session_file).pack()
+
+        # Encoder preset used when saving: fast, balanced (default) or small files
+        save_preset = tk.StringVar(crop_window, value=image_engine.DEFAULT_SAVE_PRESET)
+        tk.OptionMenu(crop_window, save_preset, *image_engine.SAVE_PRESETS).pack()
         tk.Button(crop_window, text="Undo", command=undo_crop_edit).pack()
         tk.Button(crop_window, text="Redo", command=redo_crop_edit).pack()
 
+        def bind_slider_gesture(slider, debouncer):
+            """
+            Treats each drag of a slider as one gesture, so it renders once at the end and records one undo step.
+            - slider: The tk.Scale widget.
+            - debouncer: The SliderDebouncer that receives the slider values.
+            """
+            # Gesture markers go through the same worker as the edits, so they stay in order
+            def on_press(event):
+                edit_jobs.submit(lambda job: engine.begin_gesture())
+                debouncer.begin_gesture()
+
+            def finish_gesture():
+                debouncer.end_gesture()
+                edit_jobs.submit(lambda job: engine.end_gesture())
+
+            def on_release(event):
+                # Let the slider deliver its final value before the gesture is closed
+                slider.after_idle(finish_gesture)
+
+            slider.bind("<ButtonPress-1>", on_press, add="+")
+            slider.bind("<ButtonRelease-1>", on_release, add="+")
+
+        # Slider values are debounced so a drag only renders the latest value
+        resize_debouncer = image_engine.SliderDebouncer(crop_window, crop_resize_image)
+        brightness_debouncer = image_engine.SliderDebouncer(crop_window, crop_adjust_brightness)
+
         # Resize slider for cropped image
         resize_slider = tk.Scale(crop_window, from_=0.1, to=2.0, resolution=0.1, orient=tk.HORIZONTAL,
-                                 label="Resize Image", command=crop_resize_image)
-        resize_slider.set(1)  # Default resize image factor
+                                 label="Resize Image", command=resize_debouncer.submit)
+        resize_slider.set(engine.scale)  # Default resize image factor
         resize_slider.pack()
+        bind_slider_gesture(resize_slider, resize_debouncer)
 
         # Brightness slider for cropped image
         brightness_slider = tk.Scale(crop_window, from_=0.1, to=2.0, resolution=0.1, orient=tk.HORIZONTAL,
-                                      label="Brightness", command=crop_adjust_brightness)
-        brightness_slider.set(1)  # Default brightness
+                                      label="Brightness", command=brightness_debouncer.submit)
+        brightness_slider.set(engine.adjustments.get("brightness", 1))  # Default brightness
         brightness_slider.pack()
+        bind_slider_gesture(brightness_slider, brightness_debouncer)
+
+        edit_status.pack()
+        memory_status.pack()
+        refresh_memory_status()
+        edit_jobs.submit(lambda job: histogram.update(engine), on_done=show_stats)
+
+        # Replace the preview with the full-resolution crop once it has been decoded
+        full_crop_pending = full_crop_box is not None
+        full_crop_error = None  # Set if the full-resolution crop could not be decoded or applied
+        if full_crop_pending:
+            source = self.source
+            crop_window.title("Cropped Image (loading full resolution...)")
+
+            def full_crop_ready():
+                nonlocal full_crop_pending
+                full_crop_pending = False
+                crop_window.title("Cropped Image")
+
+            def full_crop_failed(e):
+                nonlocal full_crop_pending, full_crop_error
+                full_crop_pending = False
+                full_crop_error = e
+                if crop_window.winfo_exists():
+                    crop_window.title("Cropped Image (preview only)")
+
+            def on_full_crop(full_crop):
+                if crop_window.winfo_exists():
+                    run_edit(lambda: engine.rebase(full_crop), then=full_crop_ready, failed=full_crop_failed)
+
+            def on_full_crop_error(e):
+                full_crop_failed(e)
+                if crop_window.winfo_exists():
+                    messagebox.showerror("Error", f"Failed to load the full-resolution image: {e}",
+                                         parent=crop_window)
+
+            self.jobs.submit(lambda job: source.crop(full_crop_box), on_done=on_full_crop, on_error=on_full_crop_error)
 
         # Bind the close event to custom function for confirmation
         crop_window.protocol("WM_DELETE_WINDOW", self.on_close_crop_window(crop_window))
@@ -319,6 +938,13 @@ class ImageEditor(tk.Tk):
         parent_window.wait_window(msg_box)  # Wait for the message box to close
         return True  # Default return value; change after user interaction
     
+    def on_destroy(self, event):
+        """
+        Stops the thumbnail worker processes when the main window closes.
+        """
+        if event.widget is self:
+            self.thumbnails.shutdown()
+
     def load_image_shortcut(self, event):
         """
         Handles the keyboard shortcut (Ctrl+O) for loading an image.
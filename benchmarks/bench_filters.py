@@ -0,0 +1,62 @@
+# ==================================================
+# Filter Benchmarks: time every filter plugin and flag slow ones
+# ==================================================
+"""
+Runs every registered filter plugin (built-in and from G37_FILTER_DIR) on synthetic images and prints the results
+as JSON. A filter is flagged as slow when its throughput is under MIN_FILTER_THROUGHPUT for its kind; the exit code
+is 1 if any filter was flagged.
+
+Usage:
+    python benchmarks/bench_filters.py                    # every filter on a 4 MP image
+    python benchmarks/bench_filters.py --sizes 4 16 --filters blur sharpen --output filters.json
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import image_engine  # noqa: E402
+from run_benchmarks import environment, synthetic_image  # noqa: E402
+
+DEFAULT_SIZES_MP = [4]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the G37 Image Editor filter plugins.")
+    parser.add_argument("--sizes", type=float, nargs="*", default=DEFAULT_SIZES_MP,
+                        help="Synthetic image sizes in megapixels (default: 4)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per filter (default: 3)")
+    parser.add_argument("--filters", nargs="*", help="Only these filters (default: all)")
+    parser.add_argument("--filter-dir", help="Also load the filter plugins in this folder")
+    parser.add_argument("--workers", type=int, help="Threads filters are split across (default: all cores)")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        image_engine.set_workers(args.workers)
+    report = {"environment": environment(), "repeat": args.repeat,
+              "load_errors": image_engine.discover_filters(args.filter_dir), "filters": {}}
+    names = args.filters or [plugin.name for plugin in image_engine.available_filters()]
+
+    for megapixels in args.sizes:
+        image = image_engine.ImageArray.from_pil(synthetic_image(megapixels)).to_pil()  # As the crop window has it
+        for name in names:
+            result = image_engine.benchmark_filter(name, image, args.repeat)
+            report["filters"].setdefault(name, {})[f"{megapixels:g}mp"] = result
+    report["slow"] = sorted(name for name, sizes in report["filters"].items()
+                            if any(result["slow"] for result in sizes.values()))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["slow"] or report["load_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+# ==================================================
+# Benchmark Suite: time each stage of the editing workflow
+# ==================================================
+"""
+Runs the editor's workflow headless (no Tk) on the bundled sample images and on synthetic images,
+and prints the results as JSON.
+
+Usage:
+    python benchmarks/run_benchmarks.py                          # samples + 1, 4, 16, 50, 100 MP
+    python benchmarks/run_benchmarks.py --sizes 1 4 --repeat 3 --output run.json
+    python benchmarks/run_benchmarks.py --compare baseline.json  # also flags regressions against an earlier run
+    python benchmarks/run_benchmarks.py --trace trace.json       # also writes a Chrome trace of every span
+    python benchmarks/run_benchmarks.py --sizes 50 --workers 1   # compare with the default to see multi-core scaling
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import PIL  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import image_engine  # noqa: E402
+
+SAMPLE_IMAGES = ["sample_image1.png", "sample_image2.png", "sample_image3.png"]
+DEFAULT_SIZES_MP = [1, 4, 16, 50, 100]
+CANVAS_SIZE = (800, 600)             # Canvas size of the main window
+CROP_MAPPING_CALLS = 1000            # crop_box is timed over many calls, as one call takes microseconds
+REGRESSION_THRESHOLD = 1.10          # --compare flags stages whose median got more than 10% slower
+
+
+class PeakMemory:
+    """
+    Measures the peak memory while a block runs.
+    - peak_rss: Growth of the resident set size over its starting value, sampled from /proc (Linux only, else None).
+    - peak_traced: Peak of Python and NumPy allocations seen by tracemalloc (Pillow's own buffers are not included).
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak_rss = None
+        self.peak_traced = 0
+
+    @staticmethod
+    def rss():
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            current = self.rss()
+            if current is not None:
+                self._max_rss = max(self._max_rss, current)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._start_rss = self.rss()
+        self._max_rss = self._start_rss or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.peak_traced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self._stop.set()
+        self._thread.join()
+        end_rss = self.rss()
+        if self._start_rss is not None:
+            self.peak_rss = max(self._max_rss, end_rss or 0) - self._start_rss
+        return False
+
+
+def synthetic_image(megapixels):
+    """
+    Creates a reproducible RGB test image of about the given size (4:3) with gradients and noise.
+    """
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(37)
+    array = np.empty((height, width, 3), np.uint8)
+    array[..., 0] = (np.arange(width) * 255 // max(1, width - 1)).astype(np.uint8)
+    array[..., 1] = (np.arange(height) * 255 // max(1, height - 1)).astype(np.uint8)[:, None]
+    array[..., 2] = rng.integers(0, 256, (height, width), np.uint8)
+    return Image.fromarray(array, "RGB")
+
+
+def summarise(samples, megapixels):
+    """
+    Turns a list of durations (seconds) into median/p95 latency and throughput.
+    """
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(ordered),
+        "median_ms": median * 1000,
+        "p95_ms": p95 * 1000,
+        "throughput_mp_per_s": megapixels / median if median > 0 else None,
+    }
+
+
+def time_stage(func, repeat, megapixels):
+    """
+    Runs func repeat times for latency and throughput, then once more to measure peak memory.
+    - Memory is measured in a separate run because tracemalloc and RSS sampling slow the code down.
+    - func: The stage to run. If it returns a float, that is the duration charged; otherwise the whole call is timed.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        charged = func()
+        elapsed = time.perf_counter() - start
+        samples.append(charged if isinstance(charged, float) else elapsed)
+    result = summarise(samples, megapixels)
+
+    with PeakMemory() as memory:
+        func()
+    result["peak_rss_bytes"] = memory.peak_rss
+    result["peak_traced_bytes"] = memory.peak_traced
+    return result
+
+
+def benchmark_file(path, repeat, scratch_dir):
+    """
+    Times every workflow stage for one image file.
+    """
+    source = image_engine.SourceImage(path, cache=None)
+    megapixels = source.size[0] * source.size[1] / 1_000_000
+    stages = {}
+
+    # open: header + display-sized preview, as load_image does (decoded from disk every time)
+    def open_preview():
+        image_engine.SourceImage(path, cache=None).preview(*CANVAS_SIZE)
+    stages["open"] = time_stage(open_preview, repeat, megapixels)
+
+    # reopen_cached: the same, for a file still in the decoded-image cache
+    cache = image_engine.LRUCache(image_engine.DEFAULT_DECODE_CACHE_BYTES)
+    image_engine.SourceImage(path, cache=cache).preview(*CANVAS_SIZE)
+    stages["reopen_cached"] = time_stage(
+        lambda: image_engine.SourceImage(path, cache=cache).preview(*CANVAS_SIZE), repeat, megapixels)
+
+    # resize_to_fit: pyramid fit of the preview to the canvas (a fresh pyramid each run, as on load)
+    preview = image_engine.SourceImage(path, cache=None).preview(*CANVAS_SIZE)
+    stages["resize_to_fit"] = time_stage(
+        lambda: image_engine.ImagePyramid(preview).fit(*CANVAS_SIZE), repeat, megapixels)
+
+    # crop_mapping: the canvas -> full-resolution mapping done in on_mouse_release
+    viewport = image_engine.Viewport(source.size, CANVAS_SIZE)
+
+    def map_crops():
+        start = time.perf_counter()
+        for i in range(CROP_MAPPING_CALLS):
+            viewport.crop_box((10 + i % 50, 20), (400, 300 + i % 50))
+        return (time.perf_counter() - start) / CROP_MAPPING_CALLS
+    stages["crop_mapping"] = time_stage(map_crops, repeat, megapixels)
+
+    # Edits on the full-resolution image, as the crop window would run them
+    full = source.full()
+    stages["decode_full"] = time_stage(lambda: image_engine.SourceImage(path, cache=None).full(), repeat, megapixels)
+    stages["grayscale"] = time_stage(lambda: image_engine.to_grayscale(full, full), repeat, megapixels)
+    stages["brightness"] = time_stage(lambda: image_engine.adjust_image(full, full, brightness=1.3), repeat, megapixels)
+    # Rotate and resize go through the composed transform, as EditEngine.rotate and resize do
+    stages["rotate"] = time_stage(lambda: image_engine.transform_image(full, full, angle=90), repeat, megapixels)
+    stages["resize"] = time_stage(lambda: image_engine.transform_image(full, full, scale=0.5), repeat, megapixels)
+
+    save_path = os.path.join(scratch_dir, "benchmark_output.png")
+    stages["save"] = time_stage(lambda: image_engine.save_image(full, save_path), repeat, megapixels)
+
+    return {
+        "width": source.size[0],
+        "height": source.size[1],
+        "megapixels": round(megapixels, 3),
+        "format": source.format,
+        "stages": stages,
+    }
+
+
+def environment():
+    """
+    Records what the numbers were measured with, so runs on different setups are not compared blindly.
+    """
+    backend = image_engine.get_backend()
+    try:
+        import cv2
+        opencv = cv2.__version__
+    except ImportError:
+        opencv = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "opencv": opencv,
+        "backend": backend.name,
+        "workers": image_engine.worker_count(),
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Lists stages whose median latency grew by more than threshold compared with a baseline run.
+    """
+    regressions = []
+    for name, image in current["images"].items():
+        old_image = baseline.get("images", {}).get(name)
+        if not old_image:
+            continue
+        for stage, result in image["stages"].items():
+            old = old_image["stages"].get(stage)
+            if old and old["median_ms"] > 0 and result["median_ms"] / old["median_ms"] > threshold:
+                regressions.append({
+                    "image": name,
+                    "stage": stage,
+                    "baseline_median_ms": old["median_ms"],
+                    "median_ms": result["median_ms"],
+                    "ratio": result["median_ms"] / old["median_ms"],
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the G37 Image Editor engine.")
+    parser.add_argument("--sizes", type=float, nargs="*", default=DEFAULT_SIZES_MP,
+                        help="Synthetic image sizes in megapixels (default: 1 4 16 50 100)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per stage (default: 5)")
+    parser.add_argument("--no-samples", action="store_true", help="Skip the bundled sample images")
+    parser.add_argument("--format", choices=["JPEG", "PNG"], default="JPEG",
+                        help="File format the synthetic images are written in (default: JPEG)")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--trace", help="Also record a Chrome trace of the run to this file (slows it slightly)")
+    parser.add_argument("--workers", type=int, help="Threads edits are split across (default: G37_WORKERS or all cores)")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        image_engine.set_workers(args.workers)
+    if args.trace:
+        image_engine.enable_tracing()
+    report = {"environment": environment(), "repeat": args.repeat, "images": {}}
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        if not args.no_samples:
+            for name in SAMPLE_IMAGES:
+                path = os.path.join(ROOT, name)
+                if os.path.exists(path):
+                    report["images"][name] = benchmark_file(path, args.repeat, scratch_dir)
+
+        for megapixels in args.sizes:
+            name = f"synthetic_{megapixels:g}mp.{args.format.lower()}"
+            path = os.path.join(scratch_dir, name)
+            synthetic_image(megapixels).save(path, args.format, quality=90)
+            report["images"][name] = benchmark_file(path, args.repeat, scratch_dir)
+            os.remove(path)
+
+    if args.trace:
+        image_engine.export_trace(args.trace)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report["regressions"] = compare(report, json.load(baseline_file))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
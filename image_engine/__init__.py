@@ -0,0 +1,128 @@
+"""
+Headless image editing engine used by the G37 Image Editor.
+Nothing in this package imports tkinter, so it can run on servers and workers without a display.
+"""
+from .arrays import STORAGE_MODES, ImageArray, as_array, copy_array
+from .backends import (
+    BACKEND_ENV_VAR,
+    BACKENDS,
+    DEFAULT_BACKEND,
+    AutoBackend,
+    OpenCVBackend,
+    PillowBackend,
+    get_backend,
+    select_backend,
+)
+from .cache import LRUCache
+from .debounce import DEFAULT_DEBOUNCE_MS, FRAME_MS, FrameThrottle, SliderDebouncer
+from .engine import (
+    ADJUSTMENTS,
+    DEFAULT_RESULT_CACHE_BYTES,
+    OPERATIONS,
+    EditEngine,
+    adjust_image,
+    adjustment_steps,
+    filter_image,
+    fit_size,
+    image_token,
+    operation,
+    params_key,
+    to_grayscale,
+    transform_image,
+)
+from .filters import (
+    FILTER_DIR_ENV_VAR,
+    FILTER_KINDS,
+    FILTERS,
+    MIN_FILTER_THROUGHPUT,
+    FilterPlugin,
+    apply_filter,
+    available_filters,
+    benchmark_filter,
+    discover_filters,
+    filter_plugin,
+    gaussian_blur,
+    gaussian_radius,
+    to_uint8,
+)
+from .geometry import TRANSPOSES, Geometry, rotate_scaled, scaled_size
+from .histogram import (
+    HISTOGRAM_SAMPLE_PIXELS,
+    ImageStats,
+    LiveHistogram,
+    exact_stats,
+    sample_stats,
+)
+from .history import (
+    DEFAULT_HISTORY_BUDGET,
+    DEFAULT_KEYFRAME_INTERVAL,
+    EditHistory,
+    image_nbytes,
+)
+from .jobs import DEFAULT_WORKERS, Job, JobCancelled, JobExecutor
+from .loader import (
+    DECODE_CACHE,
+    DECODE_CACHE_ENV_VAR,
+    DEFAULT_DECODE_CACHE_BYTES,
+    DEFAULT_MAX_IMAGE_PIXELS,
+    DRAFT_FORMATS,
+    MAX_PIXELS_ENV_VAR,
+    SourceImage,
+    file_key,
+    set_max_pixels,
+)
+from .memory import DEFAULT_MEMORY_BUDGET, MEMORY_ENV_VAR, MemoryManager, SpilledImage
+from .parallel import MIN_PARALLEL_PIXELS, WORKERS_ENV_VAR, run_strips, set_workers, split_rows, worker_count
+from .pointops import POINT_OPERATIONS, compile_lut, point_operation
+from .pyramid import ImagePyramid
+from .saving import (
+    DEFAULT_SAVE_PRESET,
+    SAVE_PRESETS,
+    encoder_options,
+    format_for_path,
+    prepare_for_format,
+    save_image,
+)
+from .session import (
+    SESSION_EXTENSION,
+    SESSION_VERSION,
+    SessionError,
+    file_hash,
+    read_session,
+    restore_session,
+    save_session,
+)
+from .thumbnails import (
+    DEFAULT_THUMBNAIL_CACHE_BYTES,
+    IMAGE_EXTENSIONS,
+    THUMBNAIL_CACHE_ENV_VAR,
+    THUMBNAIL_DIR_ENV_VAR,
+    THUMBNAIL_SIZE,
+    ThumbnailGenerator,
+    default_thumbnail_dir,
+    list_images,
+    make_thumbnail,
+    prune_thumbnails,
+    thumbnail_key,
+)
+from .tracing import (
+    NULL_SPAN,
+    TRACE_ENV_VAR,
+    TRACER,
+    Tracer,
+    disable_tracing,
+    enable_tracing,
+    export_trace,
+    span,
+)
+from .viewport import (
+    DEFAULT_TILE_CACHE_BYTES,
+    DEFAULT_TILE_SIZE,
+    FAST_RESAMPLE,
+    MAX_ZOOM,
+    QUALITY_RESAMPLE,
+    RESIZE_SETTLE_MS,
+    TileRenderer,
+    Viewport,
+    display_size,
+)
@@ -0,0 +1,230 @@
+# ==================================================
+# Array Images: NumPy-backed pixels shared with PIL without copying
+# ==================================================
+import numpy as np
+from PIL import Image
+
+from .parallel import run_strips
+
+# PIL mode -> (storage mode, channels). Storage modes are ones Image.frombuffer can map straight onto an array;
+# RGB is stored with a padding byte (RGBX) because that is also how Pillow lays RGB out in memory.
+STORAGE_MODES = {
+    "L": ("L", 1),
+    "RGB": ("RGBX", 4),
+    "RGBX": ("RGBX", 4),
+    "RGBA": ("RGBA", 4),
+}
+
+STRIP_ROWS = 256  # Rows processed at a time, so per-pixel operations need only a small scratch buffer
+
+
+def _storage_mode(image):
+    """
+    Picks the mode an image is stored in.
+    - Returns: (storage mode, mode to convert to first), the latter None for modes that can be stored as they are;
+      others (P, 1, LA, CMYK, ...) are converted first.
+    """
+    if image.mode in STORAGE_MODES:
+        return STORAGE_MODES[image.mode][0], None
+    if "A" in image.getbands() or "transparency" in image.info:
+        return "RGBA", "RGBA"
+    if image.mode in ("1", "I", "I;16", "F"):
+        return "L", "L"
+    return "RGBX", "RGB"
+
+
+def _owner(array):
+    """
+    Finds the contiguous array that owns the memory a view looks into.
+    """
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+class ImageArray:
+    """
+    Image pixels held in a uint8 NumPy array of shape (height, width) for L or (height, width, 4) for RGBX/RGBA.
+    - to_pil() maps the array into a PIL image without copying, and crop() returns a view, not a copy.
+    - apply_lut() changes the pixels in place, so make a copy() first if the original must be kept.
+    - array: The pixel array.
+    - mode: The storage mode ("L", "RGBX" or "RGBA").
+    """
+
+    def __init__(self, array, mode):
+        self.array = array
+        self.mode = mode
+
+    @classmethod
+    def empty(cls, size, mode):
+        """
+        Allocates an uninitialised image of the given (width, height) and storage mode.
+        """
+        channels = STORAGE_MODES[mode][1]
+        shape = (size[1], size[0]) if channels == 1 else (size[1], size[0], channels)
+        return cls(np.empty(shape, np.uint8), mode)
+
+    @classmethod
+    def from_pil(cls, image):
+        """
+        Copies a PIL image into a new array; the only full-size allocation is the array itself.
+        - The image is copied a strip of rows at a time. Pillow converts each strip (e.g. RGB to RGBX, or P to RGBA)
+          and writes it straight into the array's memory, so a conversion needs one strip of scratch memory instead
+          of a converted copy of the whole image. Large images are split across the worker threads.
+        """
+        mode, convert = _storage_mode(image)
+        image.load()  # Decode once, before the strips read it from several threads
+        result = cls.empty(image.size, mode)
+        width, height = image.size
+
+        def copy_rows(top, bottom):
+            for start in range(top, bottom, STRIP_ROWS):
+                box = (0, start, width, min(start + STRIP_ROWS, bottom))
+                strip = image.crop(box)
+                if convert is not None:
+                    strip = strip.convert(convert)
+                target = result.crop(box).to_pil()
+                target.readonly = 0  # The array is writable, so let Pillow paste into it rather than copy it first
+                target.paste(strip, (0, 0))
+        run_strips(copy_rows, height, width)
+        return result
+
+    @property
+    def size(self):
+        return self.array.shape[1], self.array.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+    def to_pil(self):
+        """
+        Returns a PIL image that shares this array's memory.
+        - Views (e.g. from crop()) are mapped with a row stride; a copy is only made if the view cannot be mapped.
+        - The PIL image is read-only: PIL operations on it create new images and leave the array untouched.
+        """
+        width, height = self.size
+        array = self.array
+        if array.flags.c_contiguous:
+            return self._mapped(Image.frombuffer(self.mode, (width, height), array, "raw", self.mode, 0, 1))
+
+        owner = _owner(array)
+        pixel_bytes = STORAGE_MODES[self.mode][1]
+        if owner.flags.c_contiguous and array.strides[1] == pixel_bytes:
+            stride = array.strides[0]
+            offset = array.__array_interface__["data"][0] - owner.__array_interface__["data"][0]
+            flat = owner.reshape(-1)
+            if offset + height * stride <= flat.nbytes:
+                return self._mapped(Image.frombuffer(self.mode, (width, height), flat[offset:offset + height * stride],
+                                                     "raw", self.mode, stride, 1))
+        return ImageArray(np.ascontiguousarray(array), self.mode).to_pil()
+
+    def _mapped(self, image):
+        """
+        Remembers which array a mapped PIL image looks into, so as_array() can get back to it without copying.
+        """
+        image._image_array = self
+        return image
+
+    def copy(self):
+        return ImageArray(self.array.copy(), self.mode)
+
+    def crop(self, box):
+        """
+        Returns the region box = (left, upper, right, lower) as a view into the same memory.
+        """
+        left, upper, right, lower = box
+        return ImageArray(self.array[upper:lower, left:right], self.mode)
+
+    def colour_bands(self):
+        """
+        A view of the colour channels only (alpha and padding are left out).
+        """
+        return self.array if self.array.ndim == 2 else self.array[..., :3]
+
+    def apply_lut(self, lut):
+        """
+        Maps every colour value through a 256-entry lookup table, in place; alpha and padding are left unchanged.
+        - Each strip of rows is mapped by Pillow's point() and pasted back into the array, so the only scratch memory
+          is one strip per worker thread. Large images are split across the worker threads (see run_strips).
+        """
+        table = []
+        for band in self.mode:
+            table.extend(range(256) if band in ("A", "X") else lut)
+        width, height = self.size
+
+        def map_rows(top, bottom):
+            for start in range(top, bottom, STRIP_ROWS):
+                strip = self.crop((0, start, width, min(start + STRIP_ROWS, bottom)))
+                target = strip.to_pil()
+                if target._image_array is not strip:  # Not mapped onto the array (an unusual view): map it in NumPy
+                    bands = strip.colour_bands()
+                    np.take(np.asarray(lut, np.uint8), bands, out=bands, mode="clip")
+                    continue
+                mapped = target.point(table)
+                target.readonly = 0  # Let Pillow paste straight into the array
+                target.paste(mapped, (0, 0))
+        run_strips(map_rows, height, width)
+        return self
+
+    def grayscale(self):
+        """
+        Returns a new L image using the same ITU-R 601-2 luma weights as Image.convert("L").
+        - The conversion runs in strips of rows, so the only scratch memory is one strip of 32-bit sums per worker
+          thread. Large images are split across the worker threads (see run_strips).
+        """
+        if self.mode == "L":
+            return self.copy()
+        width, height = self.size
+        result = ImageArray.empty(self.size, "L")
+
+        def convert_rows(top, bottom):
+            scratch = np.empty((min(bottom - top, STRIP_ROWS), width), np.uint32)
+            term = np.empty_like(scratch)
+            for start in range(top, bottom, STRIP_ROWS):
+                rows = self.array[start:min(start + STRIP_ROWS, bottom)]
+                total = scratch[:len(rows)]
+                part = term[:len(rows)]
+                np.multiply(rows[..., 0], 19595, out=total, dtype=np.uint32)
+                np.multiply(rows[..., 1], 38470, out=part, dtype=np.uint32)
+                total += part
+                np.multiply(rows[..., 2], 7471, out=part, dtype=np.uint32)
+                total += part
+                total += 0x8000
+                total >>= 16
+                result.array[start:start + len(rows)] = total
+        run_strips(convert_rows, height, width)
+        return result
+
+
+def buffer_key(image):
+    """
+    Identifies the memory holding an image's pixels, so memory shared by several images is counted once.
+    - Images mapped onto the same array, or onto views of it, share a key; any other image is its own key.
+    """
+    backing = getattr(image, "_image_array", None)
+    if backing is not None and image.readonly:
+        return id(_owner(backing.array))
+    return id(image)
+
+
+def copy_array(image):
+    """
+    Returns an ImageArray with its own copy of an image's pixels, whether or not the image is already array-backed.
+    - The copy is the only full-size allocation (see ImageArray.from_pil).
+    """
+    backing = getattr(image, "_image_array", None)
+    if backing is not None and image.readonly:
+        return backing.copy()
+    return ImageArray.from_pil(image)
+
+
+def as_array(image):
+    """
+    Returns the ImageArray behind a PIL image made by ImageArray.to_pil(), or copies the image into a new one.
+    - A mapped image that Pillow has since copied (it is no longer read-only) is copied again, as its array is stale.
+    """
+    backing = getattr(image, "_image_array", None)
+    if backing is not None and image.readonly:
+        return backing
+    return ImageArray.from_pil(image)
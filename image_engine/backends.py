@@ -0,0 +1,152 @@
+# ==================================================
+# Resampling Backends: Pillow or OpenCV for resize
+# ==================================================
+import os
+import time
+
+from PIL import Image
+
+from .arrays import ImageArray, as_array
+from .parallel import run_strips, worker_count
+from .tracing import span
+
+try:
+    import cv2
+except ImportError:  # opencv-python is optional; everything falls back to Pillow
+    cv2 = None
+
+BACKEND_ENV_VAR = "G37_IMAGE_BACKEND"  # "pillow" (the default), "opencv" or "auto"
+DEFAULT_BACKEND = "pillow"             # Backends differ by a few levels per pixel, so one is used unless asked
+AUTO_TRIALS = 3                        # Timed runs per backend before auto picks one for a size class
+STRIP_MODES = ("L", "RGB", "RGBA", "RGBX")  # Modes resized in parallel strips; others (e.g. P) in one piece
+
+
+class PillowBackend:
+    """
+    Resize with Pillow (LANCZOS resampling).
+    - Large resizes are split into horizontal strips of the output, resized on the worker threads.
+    """
+    name = "pillow"
+
+    def resize(self, image, size):
+        with span("resample.resize", "resample", image, backend=self.name, out_width=size[0], out_height=size[1]):
+            if image.mode not in STRIP_MODES:
+                return image.resize(size, Image.LANCZOS)
+            scale = image.height / size[1]
+
+            def resize_rows(top, bottom):
+                # The box is the strip's exact share of the source rows. Pillow still reads the rows around it that
+                # the filter needs, so strips meet without seams, and clamps only at the real image edges.
+                box = (0, top * scale, image.width, bottom * scale)
+                return image.resize((size[0], bottom - top), Image.LANCZOS, box=box)
+            strips = run_strips(resize_rows, size[1], size[0])
+            if len(strips) == 1:
+                return strips[0]
+            result = Image.new(strips[0].mode, size)
+            top = 0
+            for strip in strips:
+                result.paste(strip, (0, top))
+                top += strip.height
+            return result
+
+
+class OpenCVBackend:
+    """
+    Resize with OpenCV on the image's pixel array.
+    - Downscaling uses INTER_AREA (area averaging, no aliasing); upscaling uses INTER_LANCZOS4 to match Pillow.
+    - OpenCV splits a resize across its own threads; their number follows worker_count().
+    """
+    name = "opencv"
+
+    def resize(self, image, size):
+        with span("resample.resize", "resample", image, backend=self.name, out_width=size[0], out_height=size[1]):
+            cv2.setNumThreads(worker_count())
+            array = as_array(image)
+            downscale = size[0] < array.size[0] and size[1] < array.size[1]
+            interpolation = cv2.INTER_AREA if downscale else cv2.INTER_LANCZOS4
+            return ImageArray(cv2.resize(array.array, size, interpolation=interpolation), array.mode).to_pil()
+
+
+def size_class(image):
+    """
+    Buckets an image by megapixels (0: under 1 MP, 1: 1-4 MP, 2: 4-16 MP, ...) for auto backend selection.
+    """
+    megapixels = image.width * image.height / 1_000_000
+    bucket = 0
+    while megapixels >= 1:
+        megapixels /= 4
+        bucket += 1
+    return bucket
+
+
+class AutoBackend:
+    """
+    Picks the faster backend separately for each operation and image size class.
+    - The first call for an operation and size class times every backend on it (AUTO_TRIALS runs each) and keeps
+      the fastest; the trial results are thrown away and the chosen backend's result is returned. From then on
+      every call uses the chosen backend, so the same edit always gives the same pixels within a process (undo,
+      redo and rebase replay edits, and Pillow and OpenCV do not produce identical pixels).
+    - choices can be preset (e.g. from the benchmark suite's results) as {(operation, size_class): backend name}.
+    """
+    name = "auto"
+
+    def __init__(self, backends, choices=None):
+        self.backends = backends
+        self.choices = dict(choices or {})
+        self.timings = {}  # (operation, size_class) -> {backend name: median seconds}
+
+    def pick(self, operation, image, trial):
+        """
+        Returns the backend to use for an operation on this image, choosing it first if the size class is new.
+        - trial: A function(backend) running the operation, used to time each backend.
+        """
+        key = (operation, size_class(image))
+        if key not in self.choices:
+            timings = {}
+            for name, backend in self.backends.items():
+                samples = []
+                for _ in range(AUTO_TRIALS):
+                    start = time.perf_counter()
+                    trial(backend)
+                    samples.append(time.perf_counter() - start)
+                timings[name] = sorted(samples)[AUTO_TRIALS // 2]
+            self.timings[key] = timings
+            self.choices[key] = min(timings, key=timings.get)
+        return self.backends[self.choices[key]]
+
+    def resize(self, image, size):
+        return self.pick("resize", image, lambda backend: backend.resize(image, size)).resize(image, size)
+
+
+BACKENDS = {"pillow": PillowBackend()}
+if cv2 is not None:
+    BACKENDS["opencv"] = OpenCVBackend()
+
+_current = None
+
+
+def select_backend(name):
+    """
+    Selects the backend used by resize: "pillow", "opencv" or "auto".
+    - "opencv" and "auto" fall back to Pillow when OpenCV is not installed.
+    - Returns: The selected backend.
+    """
+    global _current
+    if name == "auto" and len(BACKENDS) > 1:
+        _current = AutoBackend(BACKENDS)
+    elif name in BACKENDS:
+        _current = BACKENDS[name]
+    elif name in ("auto", "opencv"):
+        _current = BACKENDS["pillow"]
+    else:
+        raise ValueError(f"Unknown image backend: {name}")
+    return _current
+
+
+def get_backend():
+    """
+    Returns the current backend, choosing it from the G37_IMAGE_BACKEND environment variable on first use.
+    """
+    if _current is None:
+        select_backend(os.environ.get(BACKEND_ENV_VAR, DEFAULT_BACKEND))
+    return _current
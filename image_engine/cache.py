@@ -0,0 +1,138 @@
+# ==================================================
+# LRU Cache: bounded cache with hit/miss statistics
+# ==================================================
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A least-recently-used cache bounded by a capacity.
+    - capacity: The maximum total size of the cached values.
+    - sizeof: A function(value) giving the size of a value; by default every value has size 1, so capacity is an item count.
+    - A value larger than the whole capacity is not cached.
+    - Safe to use from several threads.
+    """
+
+    def __init__(self, capacity, sizeof=None):
+        self.capacity = capacity
+        self.sizeof = sizeof or (lambda value: 1)
+        self.items = OrderedDict()  # key -> (value, size)
+        self.size = 0
+        self.lock = threading.RLock()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key (marking it as recently used), or default.
+        """
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, size=None):
+        """
+        Stores a value, evicting the least recently used ones until it fits.
+        - size: The size of the value; computed with sizeof when not given.
+        """
+        if size is None:
+            size = self.sizeof(value)
+        with self.lock:
+            self.discard(key)
+            if size > self.capacity:
+                return
+            self.items[key] = (value, size)
+            self.size += size
+            self.evict()
+
+    def evict(self):
+        """
+        Drops least recently used values until the total size is within the capacity.
+        """
+        self.shrink_to(self.capacity)
+
+    def shrink_to(self, size):
+        """
+        Drops least recently used values until the total size is at most size; the capacity is unchanged.
+        """
+        with self.lock:
+            while self.items and self.size > size:
+                evicted_key, (evicted, evicted_size) = self.items.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def set_capacity(self, capacity):
+        """
+        Changes the capacity, evicting values if the cache is now over it.
+        """
+        with self.lock:
+            self.capacity = capacity
+            self.evict()
+
+    def get_or_create(self, key, create):
+        """
+        Returns the cached value for key, calling create() and caching its result on a miss.
+        """
+        value = self.get(key, self)
+        if value is self:
+            value = create()
+            self.put(key, value)
+        return value
+
+    def discard(self, key):
+        """
+        Removes key from the cache if it is there.
+        """
+        with self.lock:
+            if key in self.items:
+                value, size = self.items.pop(key)
+                self.size -= size
+
+    def values(self):
+        """
+        The cached values, least recently used first.
+        """
+        with self.lock:
+            return [value for value, size in self.items.values()]
+
+    def discard_value(self, value):
+        """
+        Removes every entry holding value (compared by identity).
+        """
+        with self.lock:
+            for key in [key for key, (cached, size) in self.items.items() if cached is value]:
+                self.discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Returns the cache statistics as a dictionary.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "items": len(self.items),
+            "size": self.size,
+            "capacity": self.capacity,
+        }
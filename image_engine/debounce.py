@@ -0,0 +1,141 @@
+# ==================================================
+# Debouncing: render only the latest slider value or pointer position
+# ==================================================
+
+DEFAULT_DEBOUNCE_MS = 50  # Quiet time after the last slider tick before rendering
+FRAME_MS = 16             # One display frame at about 60 Hz
+
+
+class SliderDebouncer:
+    """
+    Coalesces a burst of slider values into as few renders as possible.
+    - scheduler: Any object with after(ms, func) and after_cancel(id), e.g. a Tk widget.
+    - render: A function(value) that performs the (expensive) render for a slider value.
+    - delay_ms: How long the slider must be quiet before the latest value is rendered.
+    - Values that are replaced before their render starts are dropped, so only the latest value is ever rendered.
+    """
+
+    def __init__(self, scheduler, render, delay_ms=DEFAULT_DEBOUNCE_MS):
+        self.scheduler = scheduler
+        self.render = render
+        self.delay_ms = delay_ms
+        self.pending = None   # Latest value still waiting to be rendered
+        self.timer = None     # Id of the scheduled flush
+        self.in_gesture = False
+
+        # Statistics
+        self.requests = 0           # Slider values received
+        self.renders = 0            # Renders actually performed
+        self.dropped = 0            # Values replaced by a newer one before rendering
+        self.gestures = 0           # Completed gestures
+        self.gesture_renders = []   # Renders performed in each completed gesture
+        self._renders_at_gesture_start = 0
+
+    def submit(self, value):
+        """
+        Queues a slider value; any value still waiting is replaced by this one.
+        """
+        self.requests += 1
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = value
+        if self.timer is not None:
+            self.scheduler.after_cancel(self.timer)
+        self.timer = self.scheduler.after(self.delay_ms, self.flush)
+
+    def flush(self):
+        """
+        Renders the latest queued value now, if there is one.
+        """
+        if self.timer is not None:
+            self.scheduler.after_cancel(self.timer)
+            self.timer = None
+        if self.pending is None:
+            return
+        value, self.pending = self.pending, None
+        self.renders += 1
+        self.render(value)
+
+    def begin_gesture(self):
+        """
+        Marks the start of a drag (e.g. on mouse press over the slider).
+        """
+        self.in_gesture = True
+        self._renders_at_gesture_start = self.renders
+
+    def end_gesture(self):
+        """
+        Marks the end of a drag; the final value is rendered immediately.
+        """
+        self.flush()
+        if self.in_gesture:
+            self.in_gesture = False
+            self.gestures += 1
+            self.gesture_renders.append(self.renders - self._renders_at_gesture_start)
+
+    def stats(self):
+        """
+        Returns the render statistics as a dictionary, including the mean renders per gesture.
+        """
+        return {
+            "requests": self.requests,
+            "renders": self.renders,
+            "dropped": self.dropped,
+            "gestures": self.gestures,
+            "renders_per_gesture": (sum(self.gesture_renders) / len(self.gesture_renders)
+                                    if self.gesture_renders else 0.0),
+        }
+
+
+class FrameThrottle:
+    """
+    Coalesces rapid events (such as mouse motion) so the handler runs at most once per frame, with the latest arguments.
+    - Unlike SliderDebouncer it does not wait for the events to stop, so a drag still updates every frame.
+    - scheduler: Any object with after(ms, func) and after_cancel(id), e.g. a Tk widget.
+    - handler: The function called with the arguments of the latest event.
+    """
+
+    def __init__(self, scheduler, handler, frame_ms=FRAME_MS):
+        self.scheduler = scheduler
+        self.handler = handler
+        self.frame_ms = frame_ms
+        self.pending = None   # Arguments of the latest event not handled yet
+        self.timer = None
+
+        # Statistics
+        self.requests = 0
+        self.runs = 0
+
+    def submit(self, *args):
+        """
+        Queues an event; it is handled at the next frame together with (in place of) any others before then.
+        """
+        self.requests += 1
+        self.pending = args
+        if self.timer is None:
+            self.timer = self.scheduler.after(self.frame_ms, self.flush)
+
+    def flush(self):
+        """
+        Handles the latest queued event now, if there is one.
+        """
+        if self.timer is not None:
+            self.scheduler.after_cancel(self.timer)
+            self.timer = None
+        if self.pending is None:
+            return
+        args, self.pending = self.pending, None
+        self.runs += 1
+        self.handler(*args)
+
+    def cancel(self):
+        """
+        Drops any queued event without handling it.
+        """
+        if self.timer is not None:
+            self.scheduler.after_cancel(self.timer)
+            self.timer = None
+        self.pending = None
+
+    def stats(self):
+        return {"requests": self.requests, "runs": self.runs, "dropped": self.requests - self.runs}
@@ -0,0 +1,418 @@
+# ==================================================
+# Edit Engine: image operations without any GUI
+# ==================================================
+import itertools
+import math
+
+from .arrays import as_array, buffer_key, copy_array
+from .cache import LRUCache
+from .filters import apply_filter
+from .geometry import Geometry
+from .history import DEFAULT_HISTORY_BUDGET, DEFAULT_KEYFRAME_INTERVAL, EditHistory, image_nbytes
+from .pointops import compile_lut
+from .tracing import span
+
+# Registry of edit operations: name -> function(image, source, **params)
+# - image: The current (already edited) image.
+# - source: The unedited cropped image the edit session started from.
+# - A base=N parameter is taken by EditEngine.run, not the operation: it runs on the image at position N of the
+#   edit log instead of the current one (see EditEngine.transform). A base_ratio parameter, that image's size
+#   relative to the source, is only kept in the log and also dropped.
+OPERATIONS = {}
+
+
+def operation(name, from_source=False):
+    """
+    Registers an edit operation under the given name.
+    - name: The name used to look the operation up in OPERATIONS.
+    - from_source: True if the operation only reads the source image, never the current one; its results can then
+      be reused whatever the current image is.
+    """
+    def register(func):
+        func.from_source = from_source
+        OPERATIONS[name] = func
+        return func
+    return register
+
+
+@operation("grayscale")
+def to_grayscale(image, source):
+    """
+    Converts the current image to grayscale.
+    - Runs on the image's pixel array; array-backed images are read without copying.
+    """
+    return as_array(image).grayscale().to_pil()
+
+
+# Order in which point adjustments are applied, and how each setting maps to a point operation
+ADJUSTMENTS = {
+    "levels": lambda value: ("levels", {"black": value[0], "white": value[1]}),
+    "brightness": lambda value: ("brightness", {"factor": value}),
+    "contrast": lambda value: ("contrast", {"factor": value}),
+    "gamma": lambda value: ("gamma", {"gamma": value}),
+    "invert": lambda value: ("invert", {"enabled": value}),
+}
+
+
+def adjustment_steps(settings):
+    """
+    Converts adjustment settings (e.g. brightness=1.2, invert=True) into an ordered list of point operations.
+    """
+    return [to_step(settings[name]) for name, to_step in ADJUSTMENTS.items() if name in settings]
+
+
+@operation("adjust", from_source=True)
+def adjust_image(image, source, **settings):
+    """
+    Applies all point adjustments (levels, brightness, contrast, gamma, invert) to the source image in one pass.
+    - settings: The adjustment values; see ADJUSTMENTS for the accepted names.
+    - The source pixels are copied once into an array and mapped in place with the combined lookup table.
+    """
+    return copy_array(source).apply_lut(compile_lut(adjustment_steps(settings))).to_pil()
+
+
+@operation("filter")
+def filter_image(image, source, plugin, **params):
+    """
+    Runs a registered filter plugin on the current image (see filters.py).
+    - plugin: The filter's name; params: its parameters (the filter's defaults are used for any left out).
+    """
+    return apply_filter(image, plugin, **params)
+
+
+@operation("transform")
+def transform_image(image, source, flip=False, angle=0, scale=1.0):
+    """
+    Mirrors, rotates and resizes the image in one step (see Geometry).
+    - Right angles and flips are lossless transposes; at most one resample is made.
+    """
+    return Geometry(flip, angle, scale).apply(image)
+
+
+# ==================================================
+# Fitting helpers
+# ==================================================
+def fit_size(image_size, max_width, max_height):
+    """
+    Calculates the largest size that fits within the given dimensions while keeping the aspect ratio.
+    - image_size: The (width, height) of the image.
+    - Returns: The fitted (width, height).
+    """
+    img_width, img_height = image_size
+    ratio = min(max_width / img_width, max_height / img_height)
+    return max(1, int(img_width * ratio)), max(1, int(img_height * ratio))
+
+
+# ==================================================
+# Memoized results
+# ==================================================
+DEFAULT_RESULT_CACHE_BYTES = 128 * 1024 * 1024  # Memory for remembered edit results, per edit session
+
+_image_tokens = itertools.count(1)
+
+
+def image_token(image):
+    """
+    Returns a number that identifies this image object for as long as it exists.
+    - Images compare by their pixels, which is far too slow for cache keys, so each one is tagged with a token instead.
+    """
+    token = getattr(image, "_memo_token", None)
+    if token is None:
+        token = image._memo_token = next(_image_tokens)
+    return token
+
+
+def params_key(params):
+    """
+    Turns operation parameters into a hashable key (lists become tuples, keyword order does not matter).
+    """
+    def freeze(value):
+        return tuple(freeze(item) for item in value) if isinstance(value, (list, tuple)) else value
+    return tuple(sorted((name, freeze(value)) for name, value in params.items()))
+
+
+# ==================================================
+# Edit session for a single cropped image
+# ==================================================
+class EditEngine:
+    """
+    Holds the state of one editing session: the unedited source, the current result and the edit history.
+    - source: The PIL image the session starts from (usually a crop of the loaded image).
+    - keyframe_interval: How many edits apart full snapshots are kept in the history.
+    - byte_budget: The maximum number of bytes of snapshots the history may hold.
+    - result_cache_bytes: Memory for remembered results, so going back to earlier parameters (e.g. moving a slider
+      back) returns the earlier result instead of computing it again.
+    - memory: Optional MemoryManager keeping this and other sessions within a shared budget.
+    """
+
+    def __init__(self, source, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, byte_budget=DEFAULT_HISTORY_BUDGET,
+                 result_cache_bytes=DEFAULT_RESULT_CACHE_BYTES, memory=None):
+        self.source = source         # Unedited image; adjustments work from this. Edits never modify it in place
+        self.image = self.source     # Current result after all edits
+        self.history = EditHistory(self.source, self.run, keyframe_interval, byte_budget, memory)
+        self.gesture_base = None     # Image before the current gesture started, while one is active
+        self.gesture_recorded = False
+        self.results = LRUCache(result_cache_bytes, sizeof=image_nbytes)  # (input, source, name, params) -> result
+        self.memory = memory
+        if memory is not None:
+            memory.register(self)
+
+    @property
+    def adjustments(self):
+        """
+        The point adjustment settings currently in effect (those of the latest "adjust" edit).
+        """
+        return self.last_params("adjust")
+
+    def last_params(self, name):
+        """
+        The parameters of the latest applied edit with the given operation name, or {} if there is none.
+        """
+        for entry_name, params in reversed(self.history.entries[:self.history.cursor]):
+            if entry_name == name:
+                return dict(params)
+        return {}
+
+    @property
+    def history_nbytes(self):
+        """
+        The number of bytes the undo/redo history currently uses.
+        """
+        return self.history.nbytes
+
+    def memory_usage(self):
+        """
+        Bytes used by this session: "image" (the current result), "history" (other keyframes in memory), "results"
+        (other remembered results), their sum as "memory", and "spilled" (compressed keyframes on disk).
+        - Each image is counted once, under the first of those it is found in, however many of them hold it.
+        - The source, and anything sharing its memory, is not counted; it is a view into the loaded image.
+        """
+        counted = {buffer_key(self.source)}
+
+        def count(images):
+            total = 0
+            for image in images:
+                key = buffer_key(image)
+                if key not in counted:
+                    counted.add(key)
+                    total += image_nbytes(image)
+            return total
+
+        usage = {"image": count([self.image])}
+        usage["history"] = count(self.history.images_in_memory())
+        usage["results"] = count(self.results.values())
+        usage["spilled"] = self.history.spilled_nbytes
+        usage["memory"] = usage["image"] + usage["history"] + usage["results"]
+        return usage
+
+    def spill_candidate(self):
+        """
+        Returns (age, position) of the oldest keyframe worth spilling: not the current image, nor the gesture's
+        starting image, which stay in memory anyway. None if there is none.
+        """
+        return self.history.oldest_in_memory(pinned=[self.image, self.gesture_base])
+
+    def spill_keyframe(self, position):
+        """
+        Spills a keyframe to disk and forgets the remembered results holding the same image, so its memory is freed.
+        """
+        image = self.history.spill(position)
+        if image is not None:
+            self.results.discard_value(image)
+
+    def run(self, image, name, params):
+        """
+        Runs a registered operation on an image without recording it.
+        - Results are remembered by (input image, source, operation, parameters); a repeat is returned from the cache.
+        """
+        func = OPERATIONS[name]
+        if "base" in params:
+            params = dict(params)
+            image = self.image_at(params.pop("base"))
+            params.pop("base_ratio", None)
+        input_token = None if getattr(func, "from_source", False) else image_token(image)
+        key = (input_token, image_token(self.source), name, params_key(params))
+        result = self.results.get(key)
+        if result is not None:
+            return result
+        with span("edit." + name, "enhance", image, **params) as trace:
+            result = func(image, self.source, **params)
+            trace.annotate(result)
+        self.results.put(key, result)
+        return result
+
+    def image_at(self, position):
+        """
+        The image at a position in the edit log: the current image, or one rebuilt from the history.
+        """
+        history = self.history
+        if self.gesture_base is not None and position == history.cursor - self.gesture_recorded:
+            return self.gesture_base  # The image before the gesture's own edit
+        if position == history.cursor:
+            return self.image
+        return history.render(position)
+
+    def result_stats(self):
+        """
+        Returns the result cache statistics (hits, misses, evictions, hit_rate, ...).
+        """
+        return self.results.stats()
+
+    def apply(self, name, **params):
+        """
+        Applies a registered operation to the current image and records it for undo.
+        - name: The operation name in OPERATIONS.
+        - params: Keyword parameters passed to the operation.
+        - Returns: The edited image.
+        """
+        if self.gesture_base is None:
+            self.image = self.run(self.image, name, params)
+            self.history.record(name, params, self.image)
+        else:
+            # Within a gesture every edit starts again from the image before the gesture and replaces the
+            # edit recorded earlier in the same gesture, so one drag gives one undo step
+            self.image = self.run(self.gesture_base, name, params)
+            if self.gesture_recorded:
+                self.history.amend(name, params, self.image)
+            else:
+                self.history.record(name, params, self.image)
+                self.gesture_recorded = True
+        return self.image
+
+    def restore(self, entries, cursor, keyframes):
+        """
+        Restores a saved edit log and its snapshots (see EditHistory.restore).
+        - The current image is taken from the snapshot at cursor when there is one, so nothing is replayed.
+        """
+        self.end_gesture()
+        self.history.restore(entries, cursor, keyframes)
+        self.image = self.history.render(self.history.cursor)
+        return self.image
+
+    def rebase(self, source):
+        """
+        Swaps in a new source image, such as the full-resolution crop replacing a preview, and replays the edits onto it.
+        - Returns: The current image rebuilt from the new source.
+        """
+        self.source = source
+        self.results.clear()  # Results computed from the old source can never be asked for again
+        self.history.rebase(source)
+        gesture_base, self.gesture_base = self.gesture_base, None  # Built from the old source, so not used in the replay
+        self.image = self.history.render(self.history.cursor)
+        if gesture_base is not None:
+            # The gesture's edit (if recorded) is the latest entry; its base is the state just before it
+            self.gesture_base = self.history.render(self.history.cursor - 1) if self.gesture_recorded else self.image
+        return self.image
+
+    def begin_gesture(self):
+        """
+        Starts a gesture (such as a slider drag); all edits until end_gesture are recorded as one undo step.
+        """
+        self.gesture_base = self.image
+        self.gesture_recorded = False
+
+    def end_gesture(self):
+        """
+        Ends the current gesture.
+        """
+        self.gesture_base = None
+        self.gesture_recorded = False
+
+    def undo(self):
+        """
+        Undoes the last edit.
+        - Returns: True if there was an edit to undo.
+        """
+        self.end_gesture()
+        if not self.history.can_undo:
+            return False
+        self.image = self.history.undo()
+        if self.memory is not None:
+            self.memory.enforce()  # The replay may have remembered new results
+        return True
+
+    def redo(self):
+        """
+        Redoes the last undone edit.
+        - Returns: True if there was an edit to redo.
+        """
+        self.end_gesture()
+        if not self.history.can_redo:
+            return False
+        self.image = self.history.redo()
+        if self.memory is not None:
+            self.memory.enforce()  # The replay may have remembered new results
+        return True
+
+    def grayscale(self):
+        return self.apply("grayscale")
+
+    def adjust(self, **settings):
+        """
+        Changes point adjustment settings; all adjustments in effect are applied together as one lookup table.
+        """
+        merged = self.adjustments
+        merged.update(settings)
+        return self.apply("adjust", **merged)
+
+    def adjust_brightness(self, factor):
+        return self.adjust(brightness=factor)
+
+    @property
+    def scale(self):
+        """
+        The current resize factor relative to the source's size (see resize).
+        """
+        base, base_ratio, geometry = self._geometry_chain()
+        return base_ratio * geometry.scale
+
+    def _size_ratio(self, image):
+        """
+        The size of an image relative to the source, by area so rotations do not change it.
+        """
+        return math.sqrt(image.width * image.height / (self.source.width * self.source.height))
+
+    def _geometry_chain(self):
+        """
+        Returns (base, base_ratio, geometry): where the current run of geometric edits starts in the log, the size of
+        the image there relative to the source, and the run's transform.
+        - The ratio is read from the log, so nothing is rendered; only logs saved before it was recorded rebuild the
+          base image once to measure it.
+        """
+        history = self.history
+        if history.cursor and history.entries[history.cursor - 1][0] == "transform":
+            params = dict(history.entries[history.cursor - 1][1])
+            base = params.pop("base")
+            base_ratio = params.pop("base_ratio", None)
+            if base_ratio is None:
+                base_ratio = self._size_ratio(self.image_at(base))
+            return base, base_ratio, Geometry(**params)
+        return history.cursor, self._size_ratio(self.image_at(history.cursor)), Geometry()
+
+    def transform(self, compose):
+        """
+        Applies a geometric edit, composed with the geometric edits directly before it.
+        - compose: A function(geometry, base_ratio) returning the new transform; base_ratio is the size of the image
+          the transform is applied to, relative to the source.
+        - Consecutive rotations, flips and resizes are combined into one transform that is applied to the image from
+          before the first of them, so each edit resamples the pixels at most once and four quarter turns give back
+          the original image. Every edit is still its own undo step.
+        """
+        base, base_ratio, geometry = self._geometry_chain()
+        return self.apply("transform", base=base, base_ratio=base_ratio, **compose(geometry, base_ratio).params())
+
+    def filter(self, plugin, **params):
+        return self.apply("filter", plugin=plugin, **params)
+
+    def rotate(self, degrees=90):
+        return self.transform(lambda geometry, base_ratio: geometry.rotated(degrees))
+
+    def flip(self, horizontal=True):
+        return self.transform(lambda geometry, base_ratio: geometry.flipped(horizontal))
+
+    def resize(self, factor):
+        """
+        Resizes the image to factor times the source's size.
+        - The factor is absolute: after resize(0.5) and another edit, resize(1.0) gives back the source's size.
+        """
+        return self.transform(lambda geometry, base_ratio: geometry.scaled(factor / base_ratio))
@@ -0,0 +1,128 @@
+# ==================================================
+# Geometry: rotations, flips and scaling composed into one transform
+# ==================================================
+import math
+
+from PIL import Image
+
+from .backends import get_backend
+
+# (mirrored, quarter turns counter-clockwise) -> the single lossless transpose that does both
+TRANSPOSES = {
+    (False, 1): Image.Transpose.ROTATE_90,
+    (False, 2): Image.Transpose.ROTATE_180,
+    (False, 3): Image.Transpose.ROTATE_270,
+    (True, 0): Image.Transpose.FLIP_LEFT_RIGHT,
+    (True, 1): Image.Transpose.TRANSPOSE,
+    (True, 2): Image.Transpose.FLIP_TOP_BOTTOM,
+    (True, 3): Image.Transpose.TRANSVERSE,
+}
+
+
+class Geometry:
+    """
+    A geometric transform: an optional left-right mirror, then a counter-clockwise rotation, then a scale.
+    - Geometries are immutable; rotated(), flipped() and scaled() return the composed transform, so any sequence of
+      rotations, flips and resizes collapses into one Geometry that is applied with a single resample.
+    - flip: True to mirror left-right first.
+    - angle: The rotation in degrees, counter-clockwise (kept in 0..360, so four 90 degree turns cancel out).
+    - scale: The resize factor applied to the width and height.
+    """
+
+    def __init__(self, flip=False, angle=0, scale=1.0):
+        self.flip = bool(flip)
+        self.angle = angle % 360
+        self.scale = scale
+
+    def rotated(self, degrees):
+        """
+        The transform followed by a counter-clockwise rotation.
+        """
+        return Geometry(self.flip, self.angle + degrees, self.scale)
+
+    def flipped(self, horizontal=True):
+        """
+        The transform followed by a left-right (horizontal=True) or top-bottom mirror.
+        - Mirroring after a rotation equals mirroring first and rotating the other way.
+        """
+        return Geometry(not self.flip, -self.angle if horizontal else 180 - self.angle, self.scale)
+
+    def scaled(self, scale):
+        """
+        The same rotation and flip with a different resize factor.
+        """
+        return Geometry(self.flip, self.angle, scale)
+
+    @property
+    def quarter_turns(self):
+        """
+        The rotation as a number of quarter turns (0-3), or None if it is not a right angle.
+        """
+        return int(self.angle // 90) if self.angle % 90 == 0 else None
+
+    @property
+    def is_identity(self):
+        return not self.flip and self.angle == 0 and self.scale == 1
+
+    def params(self):
+        """
+        The transform as operation parameters (see the "transform" edit operation).
+        """
+        return {"flip": self.flip, "angle": self.angle, "scale": self.scale}
+
+    def apply(self, image):
+        """
+        Transforms an image with at most one resample.
+        - The identity returns the image itself, without copying it.
+        - Right angles and flips are one lossless transpose; a scale adds one resize (through the current backend).
+        - Other angles are one bicubic affine resample with the scale folded in. When shrinking, the image is resized
+          first instead, as the affine resample does not filter out detail that is too fine for the smaller size.
+        """
+        if self.is_identity:
+            return image
+        turns = self.quarter_turns
+        if turns is not None:
+            if self.scale != 1:
+                image = get_backend().resize(image, scaled_size(image.size, self.scale))
+            method = TRANSPOSES.get((self.flip, turns))
+            return image.transpose(method) if method is not None else image
+
+        if self.flip:
+            image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        scale = self.scale
+        if scale < 1:
+            image = get_backend().resize(image, scaled_size(image.size, scale))
+            scale = 1
+        return rotate_scaled(image, self.angle, scale)
+
+
+def scaled_size(size, scale):
+    """
+    The (width, height) of an image of the given size resized by scale, at least 1x1.
+    """
+    return max(1, int(size[0] * scale)), max(1, int(size[1] * scale))
+
+
+def rotate_scaled(image, angle, scale=1.0, resample=Image.BICUBIC):
+    """
+    Rotates an image counter-clockwise and scales it in one affine resample, expanding the canvas to fit.
+    """
+    width, height = image.size
+    radians = math.radians(angle)
+    cos, sin = round(math.cos(radians), 15) * scale, round(math.sin(radians), 15) * scale
+
+    # Forward mapping about the centre (y points down): x' = cos x + sin y, y' = -sin x + cos y. The canvas is sized
+    # like rotate(expand=True) sizes it
+    corners = [(cos * x + sin * y, -sin * x + cos * y)
+               for x in (-width / 2, width / 2) for y in (-height / 2, height / 2)]
+    xs = [round(x, 9) for x, _ in corners]
+    ys = [round(y, 9) for _, y in corners]
+    out_width = max(1, math.ceil(max(xs)) - math.floor(min(xs)))
+    out_height = max(1, math.ceil(max(ys)) - math.floor(min(ys)))
+
+    # Image.transform maps each output pixel back to the input, centre to centre
+    det = scale * scale
+    a, b, d, e = cos / det, -sin / det, sin / det, cos / det
+    c = width / 2 - a * out_width / 2 - b * out_height / 2
+    f = height / 2 - d * out_width / 2 - e * out_height / 2
+    return image.transform((out_width, out_height), Image.AFFINE, (a, b, c, d, e, f), resample)
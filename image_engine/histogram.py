@@ -0,0 +1,155 @@
+# ==================================================
+# Histogram: live statistics from sampled pixels, exact ones on request
+# ==================================================
+import math
+
+import numpy as np
+from PIL import Image
+
+from .cache import LRUCache
+from .engine import ADJUSTMENTS, adjustment_steps, image_token
+from .parallel import run_strips
+from .pointops import compile_lut
+
+HISTOGRAM_SAMPLE_PIXELS = 250_000  # Pixels a live histogram is computed from, at most
+STATS_CACHE_ITEMS = 32             # Statistics kept per session, so undo and slider moves find them again
+
+
+class ImageStats:
+    """
+    Per-channel histogram, minimum, maximum and mean of an image's colour bands (alpha and padding are left out).
+    - counts: A (channels, 256) array of pixel counts.
+    - bands: The channel names, e.g. ("R", "G", "B") or ("L",).
+    - exact: True if every pixel was counted, False if the counts come from a sample.
+    """
+
+    def __init__(self, counts, bands, exact):
+        self.counts = counts
+        self.bands = bands
+        self.exact = exact
+
+    @classmethod
+    def from_histogram(cls, histogram, bands, exact):
+        """
+        Builds the statistics from a PIL histogram() list; only the colour bands are kept.
+        """
+        counts = np.asarray(histogram, np.int64).reshape(len(bands), 256)
+        colour = [index for index, band in enumerate(bands) if band not in ("A", "X")]
+        return cls(counts[colour], tuple(bands[index] for index in colour), exact)
+
+    @property
+    def pixels(self):
+        return int(self.counts[0].sum())
+
+    @property
+    def minimum(self):
+        return [int(np.flatnonzero(counts)[0]) if counts.any() else 0 for counts in self.counts]
+
+    @property
+    def maximum(self):
+        return [int(np.flatnonzero(counts)[-1]) if counts.any() else 0 for counts in self.counts]
+
+    @property
+    def mean(self):
+        values = np.arange(256)
+        return [float(counts @ values / counts.sum()) if counts.any() else 0.0 for counts in self.counts]
+
+    def remapped(self, lut):
+        """
+        The statistics after every colour value is mapped through a 256-entry lookup table.
+        - Exact for point adjustments: pixels with value v all move to lut[v], so the counts just move with them.
+        """
+        lut = np.asarray(lut)
+        counts = np.stack([np.bincount(lut, weights=counts, minlength=256).astype(np.int64)
+                           for counts in self.counts])
+        return ImageStats(counts, self.bands, self.exact)
+
+    def summary(self):
+        """
+        One line per channel, e.g. "R  min 0  max 255  mean 127.4".
+        """
+        return "\n".join(f"{band}  min {low}  max {high}  mean {mean:.1f}"
+                         for band, low, high, mean in zip(self.bands, self.minimum, self.maximum, self.mean))
+
+
+def sample_stats(image, max_pixels=HISTOGRAM_SAMPLE_PIXELS):
+    """
+    Statistics from an evenly spaced grid of at most max_pixels pixels (every step-th pixel of every step-th row).
+    - A nearest-neighbour resize picks the grid without reading the rest of the image, so the cost does not grow
+      with the image size.
+    """
+    step = max(1, math.ceil(math.sqrt(image.width * image.height / max_pixels)))
+    sample = image if step == 1 else image.resize((max(1, image.width // step), max(1, image.height // step)),
+                                                  Image.NEAREST)
+    return ImageStats.from_histogram(sample.histogram(), sample.getbands(), step == 1)
+
+
+def exact_stats(image):
+    """
+    Statistics from every pixel of the image.
+    - Array-backed images are counted in strips on the worker threads; each strip is mapped without copying.
+    """
+    backing = getattr(image, "_image_array", None)
+    if backing is None or not image.readonly:
+        return ImageStats.from_histogram(image.histogram(), image.getbands(), True)
+    width, height = backing.size
+    strips = run_strips(lambda top, bottom: np.asarray(backing.crop((0, top, width, bottom)).to_pil().histogram()),
+                        height, width)
+    return ImageStats.from_histogram(sum(strips), image.getbands(), True)
+
+
+class LiveHistogram:
+    """
+    Keeps sampled statistics of an edit session's current image up to date as edits arrive.
+    - After a point adjustment ("adjust"), the source's statistics are remapped through the adjustment's lookup
+      table instead of counting pixels again.
+    - Otherwise the new image is sampled (see sample_stats). Statistics are cached by image, so undo, redo and
+      moving a slider back find them again.
+    """
+
+    def __init__(self, max_pixels=HISTOGRAM_SAMPLE_PIXELS):
+        self.max_pixels = max_pixels
+        self.cache = LRUCache(STATS_CACHE_ITEMS)  # image token -> ImageStats
+
+    def stats_for(self, image):
+        """
+        Sampled statistics of an image, from the cache if it was seen before.
+        """
+        token = image_token(image)
+        stats = self.cache.get(token)
+        if stats is None:
+            stats = sample_stats(image, self.max_pixels)
+            self.cache.put(token, stats)
+        return stats
+
+    def exact(self, image):
+        """
+        Counts every pixel of an image (see exact_stats) and keeps the result in place of the sampled statistics.
+        """
+        stats = exact_stats(image)
+        self.cache.put(image_token(image), stats)
+        return stats
+
+    def update(self, engine):
+        """
+        Returns the statistics of the engine's current image; call it from the thread that runs the engine's edits.
+        """
+        image = engine.image
+        token = image_token(image)
+        stats = self.cache.get(token)
+        if stats is not None:
+            return stats
+
+        history = engine.history
+        if history.cursor:
+            name, params = history.entries[history.cursor - 1]
+            if name == "adjust" and set(params) <= set(ADJUSTMENTS):
+                stats = self.stats_for(engine.source).remapped(compile_lut(adjustment_steps(params)))
+        if stats is None or stats.bands != self._colour_bands(image):
+            stats = sample_stats(image, self.max_pixels)
+        self.cache.put(token, stats)
+        return stats
+
+    @staticmethod
+    def _colour_bands(image):
+        return tuple(band for band in image.getbands() if band not in ("A", "X"))
@@ -0,0 +1,238 @@
+# ==================================================
+# Edit History: operation log with periodic keyframes
+# ==================================================
+import itertools
+import threading
+
+from .tracing import span
+
+DEFAULT_KEYFRAME_INTERVAL = 10              # Keep a full snapshot every N edits
+DEFAULT_HISTORY_BUDGET = 256 * 1024 * 1024  # Bytes of snapshots kept in memory per history
+
+_keyframe_ages = itertools.count()  # Shared by all histories, so their keyframes can be ordered oldest first
+
+
+def image_nbytes(image):
+    """
+    Estimates the memory used by the pixel data of a PIL image.
+    - Pillow stores multi-band 8-bit images with 4 bytes per pixel and 32-bit modes with 4 bytes per band.
+    """
+    bands = len(image.getbands())
+    if image.mode in ("I", "F", "I;16", "I;16B", "I;16L"):
+        bytes_per_pixel = 4
+    elif bands > 1:
+        bytes_per_pixel = 4
+    else:
+        bytes_per_pixel = 1
+    return image.width * image.height * bytes_per_pixel
+
+
+class EditHistory:
+    """
+    Stores edits as a log of (operation, parameters) instead of full image copies.
+    - A full snapshot (keyframe) is kept every keyframe_interval edits; undo and redo replay the log from the nearest one.
+    - Keyframes are evicted oldest first when their total size goes over byte_budget. The keyframe at
+      position 0 (the unedited source) is always kept, so any state can still be rebuilt.
+    - With a MemoryManager, keyframes are compressed to disk (spilled) instead of evicted, and read back when a
+      replay needs them.
+    - source: The unedited image the log starts from.
+    - replay: A function(image, name, params) that applies one logged operation and returns the result.
+    - memory: Optional MemoryManager shared with other histories.
+    """
+
+    def __init__(self, source, replay, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 byte_budget=DEFAULT_HISTORY_BUDGET, memory=None):
+        self.replay = replay
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.byte_budget = byte_budget
+        self.memory = memory
+        self.entries = []            # Logged edits as (name, params)
+        self.cursor = 0              # Number of entries applied to reach the current state
+        self.keyframes = {}          # Position in the log -> snapshot at that position (an image or a spilled image)
+        self.ages = {}               # Position -> when its keyframe was stored, for oldest-first spilling
+        self.lock = threading.RLock()  # The memory manager may spill keyframes from another window's thread
+        self._set_keyframe(0, source)
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes of snapshots held in memory, not counting the source (position 0).
+        """
+        return sum(image_nbytes(image) for image in self.images_in_memory())
+
+    def images_in_memory(self):
+        """
+        The keyframes held in memory (not spilled), except the source at position 0.
+        """
+        with self.lock:
+            return [image for position, image in self.keyframes.items()
+                    if position != 0 and not getattr(image, "spilled", False)]
+
+    @property
+    def spilled_nbytes(self):
+        """
+        The number of bytes of compressed snapshots on disk.
+        """
+        with self.lock:
+            return sum(image.nbytes for image in self.keyframes.values() if getattr(image, "spilled", False))
+
+    def _set_keyframe(self, position, image):
+        self.keyframes[position] = image
+        self.ages[position] = next(_keyframe_ages)
+
+    def _drop_keyframes(self, positions):
+        for position in list(positions):
+            del self.keyframes[position]
+            del self.ages[position]
+
+    def keyframe(self, position):
+        """
+        Returns the keyframe at a position as an image, reading it back from disk if it was spilled.
+        """
+        with self.lock:
+            image = self.keyframes[position]
+        return image.load() if getattr(image, "spilled", False) else image
+
+    def oldest_in_memory(self, pinned=()):
+        """
+        Returns (age, position) of the oldest keyframe still in memory that may be spilled, or None.
+        - pinned: Images that stay in memory anyway (e.g. the current image), so spilling them would free nothing.
+        """
+        pinned = {id(image) for image in pinned}
+        with self.lock:
+            candidates = [(self.ages[position], position) for position, image in self.keyframes.items()
+                          if position != 0 and not getattr(image, "spilled", False) and id(image) not in pinned]
+        return min(candidates) if candidates else None
+
+    def spill(self, position):
+        """
+        Compresses the keyframe at a position to disk through the memory manager.
+        - The memory is only freed once nothing else (such as remembered results) holds the image.
+        - Returns: The image that was spilled, or None if there was nothing to spill.
+        """
+        with self.lock:
+            image = self.keyframes.get(position)
+        if image is None or getattr(image, "spilled", False):
+            return None
+        spilled = self.memory.spill(image)  # Compress without holding the lock, so edits are not held up
+        with self.lock:
+            if self.keyframes.get(position) is image:
+                self.keyframes[position] = spilled
+                return image
+        spilled.discard()  # The keyframe was replaced meanwhile
+        return None
+
+    @property
+    def can_undo(self):
+        return self.cursor > 0
+
+    @property
+    def can_redo(self):
+        return self.cursor < len(self.entries)
+
+    def record(self, name, params, image):
+        """
+        Records an edit that has just been applied.
+        - name, params: The operation and its parameters.
+        - image: The result of the edit, kept as a keyframe if this position is due for one.
+        """
+        with self.lock:
+            # A new edit discards everything that could have been redone
+            del self.entries[self.cursor:]
+            self._drop_keyframes(p for p in self.keyframes if p > self.cursor)
+
+            self.entries.append((name, dict(params)))
+            self.cursor += 1
+            if self.cursor % self.keyframe_interval == 0:
+                self._set_keyframe(self.cursor, image)
+        self.enforce_budget()
+
+    def amend(self, name, params, image):
+        """
+        Replaces the most recent edit, e.g. when a slider drag updates the value it recorded at the start of the drag.
+        - name, params: The operation and its new parameters.
+        - image: The new result of the edit.
+        """
+        if not self.can_undo:
+            raise IndexError("Nothing to amend")
+        with self.lock:
+            del self.entries[self.cursor:]
+            self.entries[self.cursor - 1] = (name, dict(params))
+            self._drop_keyframes(p for p in self.keyframes if p >= self.cursor)
+            if self.cursor % self.keyframe_interval == 0:
+                self._set_keyframe(self.cursor, image)
+        self.enforce_budget()
+
+    def restore(self, entries, cursor, keyframes):
+        """
+        Replaces the log with a saved one, e.g. from a session file.
+        - entries: The logged edits as (name, params); cursor: how many of them are applied.
+        - keyframes: Saved snapshots as {position: image}; position 0 (the source) is kept as it is.
+        """
+        with self.lock:
+            self.entries = [(name, dict(params)) for name, params in entries]
+            self.cursor = cursor
+            self._drop_keyframes(p for p in self.keyframes if p != 0)
+            for position in sorted(keyframes):
+                if 0 < position <= len(self.entries):
+                    self._set_keyframe(position, keyframes[position])
+        self.enforce_budget()
+
+    def rebase(self, source):
+        """
+        Replaces the image the log starts from, e.g. a preview by the full-resolution image it was cut from.
+        - All other keyframes were built from the old source, so they are dropped; the log itself is kept.
+        """
+        with self.lock:
+            self._drop_keyframes(list(self.keyframes))
+            self._set_keyframe(0, source)
+
+    def undo(self):
+        """
+        Steps back one edit.
+        - Returns: The image at the new position.
+        """
+        if not self.can_undo:
+            raise IndexError("Nothing to undo")
+        self.cursor -= 1
+        return self.render(self.cursor)
+
+    def redo(self):
+        """
+        Steps forward one edit.
+        - Returns: The image at the new position.
+        """
+        if not self.can_redo:
+            raise IndexError("Nothing to redo")
+        self.cursor += 1
+        return self.render(self.cursor)
+
+    def render(self, position):
+        """
+        Rebuilds the image at a position in the log by replaying from the nearest keyframe at or before it.
+        """
+        with self.lock:
+            start = max(p for p in self.keyframes if p <= position)
+        image = self.keyframe(start)
+        with span("history.replay", "enhance", image, keyframe=start, steps=position - start):
+            for name, params in self.entries[start:position]:
+                image = self.replay(image, name, params)
+        return image
+
+    def enforce_budget(self):
+        """
+        Evicts the oldest keyframes (never the source) until the snapshots in memory fit within the byte budget.
+        - With a memory manager they are spilled to disk instead, and the manager's shared budget is enforced too.
+        """
+        if self.byte_budget is not None:
+            while self.nbytes > self.byte_budget:
+                oldest = self.oldest_in_memory()
+                if oldest is None:
+                    break
+                if self.memory is not None:
+                    self.spill(oldest[1])
+                else:
+                    with self.lock:
+                        self._drop_keyframes([oldest[1]])
+        if self.memory is not None:
+            self.memory.enforce()
@@ -0,0 +1,212 @@
+# ==================================================
+# Background Jobs: run slow work off the UI thread
+# ==================================================
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+POLL_INTERVAL_MS = 15  # How often the UI thread collects finished work
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job (by Job.check) once the job has been cancelled.
+    """
+
+
+class Job:
+    """
+    A unit of work submitted to a JobExecutor.
+    - The job function receives the Job as its first argument, so it can call report() and check().
+    """
+
+    def __init__(self, executor, key):
+        self.executor = executor
+        self.key = key
+        self.progress = 0.0
+        self.done = False
+        self.future = None    # Set for watched futures, so cancelling reaches them too
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Cancels the job. A job that has not started is skipped; a running job's result is discarded.
+        """
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        """
+        Raises JobCancelled if the job has been cancelled; long jobs call this between steps.
+        """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, fraction):
+        """
+        Reports progress (0.0 to 1.0) from the worker thread; it is delivered to on_progress on the UI thread.
+        """
+        self.progress = fraction
+        self.executor.results.put((self, "progress", fraction))
+
+
+class JobExecutor:
+    """
+    Runs jobs on worker threads and delivers their results back on the UI thread.
+    - scheduler: Any object with after(ms, func), e.g. a Tk widget. Callbacks only ever run from its after() loop,
+      so they may safely touch Tk widgets.
+    - A callback that raises is reported (through the scheduler's report_callback_exception if it has one, as Tk
+      does for its own callbacks) and does not stop the delivery of later results.
+    - max_workers: The number of worker threads. With one worker, jobs run strictly in submission order.
+    - Submitting a job with a key cancels the previous job with the same key, as it has been superseded.
+    """
+
+    def __init__(self, scheduler, max_workers=DEFAULT_WORKERS, poll_ms=POLL_INTERVAL_MS):
+        self.scheduler = scheduler
+        self.poll_ms = poll_ms
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="g37-worker")
+        self.results = queue.SimpleQueue()
+        self.callbacks = {}   # Job -> (on_done, on_error, on_progress)
+        self.latest = {}      # Key -> most recently submitted job with that key
+        self.polling = False
+
+    @property
+    def busy(self):
+        """
+        True while any submitted job has not been delivered yet.
+        """
+        return bool(self.callbacks)
+
+    def submit(self, func, *args, key=None, on_done=None, on_error=None, on_progress=None):
+        """
+        Runs func(job, *args) on a worker thread.
+        - key: Optional key; the previous job with the same key is cancelled.
+        - on_done: Called with the result on the UI thread.
+        - on_error: Called with the exception on the UI thread.
+        - on_progress: Called with each reported progress fraction on the UI thread.
+        - Returns: The Job, which can be cancelled.
+        """
+        job = self._register(key, on_done, on_error, on_progress)
+        self.pool.submit(self._run, job, func, args)
+        return job
+
+    def watch(self, future, key=None, on_done=None, on_error=None):
+        """
+        Delivers the outcome of a concurrent.futures Future (e.g. from a process pool) on the UI thread, like a job.
+        - Returns: A Job; cancelling it also cancels the future if it has not started.
+        """
+        job = self._register(key, on_done, on_error, None)
+        job.future = future
+        future.add_done_callback(lambda done: self._deliver(job, done))
+        return job
+
+    def _register(self, key, on_done, on_error, on_progress):
+        """
+        Creates a Job for new work, cancels the one it supersedes and makes sure the UI thread is polling.
+        """
+        if key is not None:
+            previous = self.latest.get(key)
+            if previous is not None:
+                previous.cancel()
+        job = Job(self, key)
+        if key is not None:
+            self.latest[key] = job
+        self.callbacks[job] = (on_done, on_error, on_progress)
+        if not self.polling:
+            self.polling = True
+            self.scheduler.after(self.poll_ms, self.poll)
+        return job
+
+    def _deliver(self, job, future):
+        """
+        Queues the outcome of a watched future for the UI thread.
+        """
+        if future.cancelled():
+            self.results.put((job, "cancelled", None))
+        elif future.exception() is not None:
+            self.results.put((job, "error", future.exception()))
+        else:
+            self.results.put((job, "done", future.result()))
+
+    def _run(self, job, func, args):
+        """
+        Worker-thread side of a job; every outcome is queued for the UI thread.
+        """
+        if job.cancelled:
+            self.results.put((job, "cancelled", None))
+            return
+        try:
+            result = func(job, *args)
+        except JobCancelled:
+            self.results.put((job, "cancelled", None))
+        except Exception as e:
+            self.results.put((job, "error", e))
+        else:
+            self.results.put((job, "done", result))
+
+    def poll(self):
+        """
+        Delivers finished work to its callbacks; runs on the UI thread via after().
+        """
+        try:
+            while True:
+                try:
+                    job, kind, value = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                on_done, on_error, on_progress = self.callbacks.get(job, (None, None, None))
+                if kind == "progress":
+                    if on_progress and not job.cancelled:
+                        self._call(on_progress, value)
+                    continue
+
+                # The job has finished one way or another
+                job.done = True
+                self.callbacks.pop(job, None)
+                if self.latest.get(job.key) is job:
+                    del self.latest[job.key]
+                if job.cancelled or kind == "cancelled":
+                    continue  # Superseded: its result is out of date
+                if kind == "error":
+                    if on_error:
+                        self._call(on_error, value)
+                elif on_done:
+                    self._call(on_done, value)
+        finally:
+            if self.callbacks:
+                self.scheduler.after(self.poll_ms, self.poll)
+            else:
+                self.polling = False
+
+    def _call(self, callback, value):
+        """
+        Runs one callback; an exception is reported instead of escaping, so the other results are still delivered.
+        """
+        try:
+            callback(value)
+        except Exception:
+            report = getattr(self.scheduler, "report_callback_exception", None)
+            if report is not None:
+                report(*sys.exc_info())
+            else:
+                traceback.print_exc()
+
+    def shutdown(self):
+        """
+        Cancels pending jobs and stops the worker threads without waiting for running jobs.
+        - Pending jobs are forgotten straight away: jobs dropped from the queue never report back, and the results of
+          running ones are out of date. Polling then stops, releasing everything the callbacks refer to.
+        """
+        for job in list(self.callbacks):
+            job.cancel()
+        self.callbacks.clear()
+        self.latest.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,145 @@
+# ==================================================
+# Image Loading: fast preview first, full resolution on demand
+# ==================================================
+import os
+
+from PIL import Image
+
+from .arrays import ImageArray
+from .cache import LRUCache
+from .engine import fit_size
+from .history import image_nbytes
+from .tracing import span
+
+# Formats whose decoder can scale down while decoding (JPEG DCT scaling via Image.draft)
+DRAFT_FORMATS = ("JPEG",)
+
+DECODE_CACHE_ENV_VAR = "G37_DECODE_CACHE_MB"        # Overrides the decoded-image cache budget, in megabytes
+DEFAULT_DECODE_CACHE_BYTES = 512 * 1024 * 1024
+
+# Decoded pixels shared by all SourceImages, so reopening a recent file skips decoding.
+# - Keys are (absolute path, modification time, file size, "full" or "preview"); a changed file gets new keys.
+DECODE_CACHE = LRUCache(int(os.environ.get(DECODE_CACHE_ENV_VAR, 0)) * 1024 * 1024 or DEFAULT_DECODE_CACHE_BYTES)
+
+MAX_PIXELS_ENV_VAR = "G37_MAX_MEGAPIXELS"   # Overrides the largest image that may be opened, in megapixels
+DEFAULT_MAX_IMAGE_PIXELS = 4_000_000_000    # Gigapixel panoramas open; Pillow's own limit is about 179 MP
+
+
+def set_max_pixels(limit):
+    """
+    Sets the largest image, in pixels, that may be opened; None removes the limit.
+    - Pillow refuses files over twice its MAX_IMAGE_PIXELS (and warns over it) as possible decompression bombs, so
+      this sets Pillow's limit for the whole process, worker processes included once they import the engine.
+    """
+    Image.MAX_IMAGE_PIXELS = limit
+
+
+set_max_pixels(int(os.environ.get(MAX_PIXELS_ENV_VAR, 0)) * 1_000_000 or DEFAULT_MAX_IMAGE_PIXELS)
+
+
+def file_key(path):
+    """
+    Identifies the current contents of a file by its absolute path, modification time and size.
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+class SourceImage:
+    """
+    An image file that is decoded lazily.
+    - Opening only reads the file header, so the full size and format are known straight away.
+    - preview() decodes at (roughly) the display resolution; JPEGs use draft mode so the decoder skips most of the work.
+    - full() decodes the original pixels, only when a crop or save actually needs them. They are kept in an
+      ImageArray, so crop() returns views into them instead of copies.
+    - Decoded previews and full images are kept in cache (DECODE_CACHE by default; None disables caching).
+    - path: The file path of the image.
+    """
+
+    def __init__(self, path, cache=DECODE_CACHE):
+        self.path = path
+        self.cache = cache
+        self.key = file_key(path)
+        with Image.open(path) as image:
+            self.size = image.size      # Full-resolution (width, height), read from the header
+            self.format = image.format
+            self.mode = image.mode
+        self._full = None
+        self._array = None
+
+    @property
+    def full_loaded(self):
+        """
+        True once the full-resolution pixels have been decoded.
+        """
+        return self._full is not None
+
+    def preview(self, max_width, max_height):
+        """
+        Decodes a preview that is at least as large as the fitted display size.
+        - For formats without draft support this decodes (and keeps) the full image.
+        - A cached full image, or a cached preview that is large enough, is returned without decoding.
+        - Returns: The preview PIL image.
+        """
+        if self._full is None:
+            self._use_cached_full()
+        if self._full is not None:
+            return self._full
+
+        target = fit_size(self.size, max_width, max_height)
+        preview = self._cached("preview")
+        if preview is not None and preview.width >= target[0] and preview.height >= target[1]:
+            return preview
+
+        image = Image.open(self.path)
+        if image.format in DRAFT_FORMATS:
+            with span("decode.preview", "decode", image, format=image.format) as trace:
+                image.draft(image.mode, target)
+                image.load()
+                trace.annotate(image)
+            self._store("preview", image, image_nbytes(image))
+            return image
+        self._keep_full(image)
+        return self._full
+
+    def _cached(self, kind):
+        return self.cache.get(self.key + (kind,)) if self.cache is not None else None
+
+    def _store(self, kind, value, nbytes):
+        if self.cache is not None:
+            self.cache.put(self.key + (kind,), value, size=nbytes)
+
+    def _use_cached_full(self):
+        """
+        Takes the full-resolution pixels from the cache, if another SourceImage of this file decoded them.
+        """
+        array = self._cached("full")
+        if array is not None:
+            self._array = array
+            self._full = array.to_pil()
+
+    def _keep_full(self, image):
+        """
+        Moves decoded full-resolution pixels into an array; the decoded PIL image is released afterwards.
+        """
+        with span("decode.full", "decode", image, format=image.format):
+            self._array = ImageArray.from_pil(image)
+            self._full = self._array.to_pil()
+        self._store("full", self._array, self._array.nbytes)
+
+    def full(self):
+        """
+        Decodes (once) and returns the full-resolution image.
+        """
+        if self._full is None:
+            self._use_cached_full()
+        if self._full is None:
+            self._keep_full(Image.open(self.path))
+        return self._full
+
+    def crop(self, box):
+        """
+        Returns the region box = (left, upper, right, lower) of the full-resolution image without copying its pixels.
+        """
+        self.full()
+        return self._array.crop(box).to_pil()
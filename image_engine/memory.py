@@ -0,0 +1,141 @@
+# ==================================================
+# Memory Manager: one budget shared by all edit sessions
+# ==================================================
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
+
+from PIL import Image
+
+
+MEMORY_ENV_VAR = "G37_MEMORY_MB"                 # Overrides the application-wide budget, in megabytes
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+SPILL_COMPRESSION = 1                            # zlib level: fast, and still shrinks photos noticeably
+
+
+class SpilledImage:
+    """
+    An image compressed into a scratch file; load() decodes it again.
+    - The file is deleted when the SpilledImage is discarded or garbage collected.
+    """
+    spilled = True
+
+    def __init__(self, image, directory):
+        self.mode = image.mode
+        self.size = image.size
+        data = zlib.compress(image.tobytes(), SPILL_COMPRESSION)
+        handle, self.path = tempfile.mkstemp(prefix="spill-", suffix=".zlib", dir=directory)
+        with os.fdopen(handle, "wb") as spill_file:
+            spill_file.write(data)
+        self.nbytes = len(data)  # Bytes on disk
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    def load(self):
+        """
+        Reads the image back from its scratch file.
+        """
+        with open(self.path, "rb") as spill_file:
+            data = zlib.decompress(spill_file.read())
+        return Image.frombytes(self.mode, self.size, data)
+
+    def discard(self):
+        self._finalizer()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class MemoryManager:
+    """
+    Keeps the edit sessions of all crop windows within one application-wide memory budget.
+    - Counted per session: history keyframes held in memory, remembered results and the current image.
+    - When the total goes over budget, the oldest keyframes of any session are compressed to scratch files
+      (and read back when a replay needs them). If that is not enough, remembered results are dropped.
+    - budget: The byte budget (G37_MEMORY_MB, or 1 GB by default).
+    - scratch_dir: Where spilled keyframes go; a private temporary folder by default, removed on exit.
+    """
+
+    def __init__(self, budget=None, scratch_dir=None):
+        if budget is None:
+            budget = int(os.environ.get(MEMORY_ENV_VAR, 0)) * 1024 * 1024 or DEFAULT_MEMORY_BUDGET
+        self.budget = budget
+        self._scratch_dir = scratch_dir
+        self.engines = weakref.WeakSet()  # Registered EditEngines; a closed window's engine drops out by itself
+        self.lock = threading.Lock()
+        self.spills = 0
+
+    @property
+    def scratch_dir(self):
+        if self._scratch_dir is None:
+            self._scratch_dir = tempfile.mkdtemp(prefix="g37-spill-")
+            weakref.finalize(self, shutil.rmtree, self._scratch_dir, True)
+        return self._scratch_dir
+
+    def register(self, engine):
+        """
+        Adds an EditEngine to the shared budget.
+        """
+        self.engines.add(engine)
+
+    def spill(self, image):
+        """
+        Compresses an image to a scratch file; returns the SpilledImage standing in for it.
+        """
+        self.spills += 1
+        return SpilledImage(image, self.scratch_dir)
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by all registered sessions.
+        """
+        return sum(engine.memory_usage()["memory"] for engine in list(self.engines))
+
+    def enforce(self):
+        """
+        Spills the oldest keyframes, then drops remembered results, until the sessions fit within the budget.
+        - A keyframe's remembered results are dropped with it, so spilling really frees its memory. The current
+          images are never spilled, as they stay in memory anyway.
+        - The usage is measured again after each step, so memory shared between images is not counted as freed twice.
+        """
+        with self.lock:
+            engines = list(self.engines)
+
+            def excess():
+                return sum(engine.memory_usage()["memory"] for engine in engines) - self.budget
+
+            while excess() > 0:
+                candidates = []
+                for engine in engines:
+                    oldest = engine.spill_candidate()
+                    if oldest is not None:
+                        candidates.append((oldest, engine))
+                if not candidates:
+                    break
+                (age, position), engine = min(candidates, key=lambda candidate: candidate[0])
+                engine.spill_keyframe(position)
+
+            while excess() > 0:
+                engines_with_results = [engine for engine in engines if len(engine.results)]
+                if not engines_with_results:
+                    break
+                engine = max(engines_with_results, key=lambda engine: engine.results.size)
+                engine.results.shrink_to(engine.results.size - 1)  # Drops its least recently used result
+
+    def usage_text(self, engine):
+        """
+        A one-line readout of a session's memory use and the application total, e.g. for a crop window.
+        """
+        usage = engine.memory_usage()
+        megabyte = 1024 * 1024
+        text = f"Memory: {usage['memory'] / megabyte:,.0f} MB"
+        if usage["spilled"]:
+            text += f" (+{usage['spilled'] / megabyte:,.0f} MB on disk)"
+        return text + f" | all windows {self.nbytes / megabyte:,.0f} / {self.budget / megabyte:,.0f} MB"
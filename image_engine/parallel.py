@@ -0,0 +1,78 @@
+# ==================================================
+# Parallel Strips: split large images across CPU cores
+# ==================================================
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS_ENV_VAR = "G37_WORKERS"     # Overrides how many threads an edit may use
+MIN_PARALLEL_PIXELS = 1_000_000     # Smaller images are processed on the calling thread
+MIN_STRIP_ROWS = 64                 # Strips are never made thinner than this
+
+_pool = None
+_workers = None
+_lock = threading.Lock()
+_local = threading.local()  # in_pool is set on the pool's own threads, so nested calls run serially
+
+
+def worker_count():
+    """
+    The number of threads edits are split across: set_workers(), else G37_WORKERS, else the number of CPU cores.
+    """
+    if _workers is not None:
+        return _workers
+    return max(1, int(os.environ.get(WORKERS_ENV_VAR, 0)) or os.cpu_count() or 1)
+
+
+def set_workers(count):
+    """
+    Changes the number of threads edits are split across; None goes back to the default.
+    - The running pool is replaced; work already handed to it still finishes.
+    """
+    global _pool, _workers
+    with _lock:
+        _workers = None if count is None else max(1, int(count))
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _mark_pool_thread():
+    _local.in_pool = True
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(worker_count(), thread_name_prefix="g37-strip", initializer=_mark_pool_thread)
+        return _pool
+
+
+def split_rows(height, parts, min_rows=MIN_STRIP_ROWS):
+    """
+    Splits rows 0..height into at most parts strips of (nearly) equal height.
+    - Returns: A list of (top, bottom) row ranges.
+    """
+    parts = max(1, min(parts, height // max(1, min_rows)))
+    return [(height * i // parts, height * (i + 1) // parts) for i in range(parts)]
+
+
+def run_strips(func, height, width):
+    """
+    Calls func(top, bottom) for horizontal strips that together cover rows 0..height, in parallel.
+    - The strips run on a shared thread pool. Pillow and NumPy release the GIL while they work on pixels, so the
+      threads really do run at the same time, and they share the image's memory without copying it.
+    - Images under MIN_PARALLEL_PIXELS, or calls made with a single worker, run func(0, height) directly.
+    - func must only write to its own rows of the output.
+    - Returns: The results of func in strip order.
+    """
+    workers = worker_count()
+    if workers == 1 or height * width < MIN_PARALLEL_PIXELS or getattr(_local, "in_pool", False):
+        return [func(0, height)]
+    strips = split_rows(height, workers)
+    if len(strips) == 1:
+        return [func(0, height)]
+    pool = _get_pool()
+    futures = [pool.submit(func, top, bottom) for top, bottom in strips]
+    return [future.result() for future in futures]
@@ -0,0 +1,3 @@
+# ==================================================
+# Built-in Filter Plugins: every module here is imported by discover_filters()
+# ==================================================
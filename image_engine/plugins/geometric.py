@@ -0,0 +1,43 @@
+# ==================================================
+# Geometric Filters: pixels move, and the size may change
+# ==================================================
+import numpy as np
+
+from ..filters import filter_plugin
+
+TRIM_SCAN_LINES = 64  # Rows or columns compared at a time while looking for the edge of the content
+
+
+@filter_plugin("trim", "geometric", label="Trim Borders", tolerance=8)
+def trim(array, tolerance):
+    """
+    Crops away borders of the same colour as the top-left pixel (within tolerance per channel).
+    - Scans inwards from each edge a block of lines at a time, so only the borders and the first lines of content
+      are compared, not the whole image.
+    """
+    colours = array[..., :3] if array.ndim == 3 else array
+    corner = colours[0, 0]
+
+    def differs(block):
+        # |block - corner| > tolerance for any channel, in uint8 without overflow
+        result = np.maximum(block, corner) - np.minimum(block, corner) > tolerance
+        return result.any(axis=2) if result.ndim == 3 else result
+
+    def first_content(count, block_at, reverse):
+        # Index of the first line (counting from the far end if reverse) that is not all border, or None
+        for start in range(0, count, TRIM_SCAN_LINES):
+            stop = min(count, start + TRIM_SCAN_LINES)
+            lines = np.flatnonzero(block_at(count - stop, count - start) if reverse else block_at(start, stop))
+            if len(lines):
+                return count - stop + lines[-1] if reverse else start + lines[0]
+        return None
+
+    height, width = colours.shape[:2]
+    top = first_content(height, lambda a, b: differs(colours[a:b]).any(axis=1), False)
+    if top is None:
+        return array
+    bottom = first_content(height, lambda a, b: differs(colours[a:b]).any(axis=1), True)
+    rows = colours[top:bottom + 1]
+    left = first_content(width, lambda a, b: differs(rows[:, a:b]).any(axis=0), False)
+    right = first_content(width, lambda a, b: differs(rows[:, a:b]).any(axis=0), True)
+    return array[top:bottom + 1, left:right + 1]
@@ -0,0 +1,46 @@
+# ==================================================
+# Neighborhood Filters: each output pixel depends on the pixels around it
+# ==================================================
+import numpy as np
+
+from ..backends import cv2
+from ..filters import filter_plugin, gaussian_blur, gaussian_radius
+
+
+@filter_plugin("blur", "neighborhood", halo=lambda params: gaussian_radius(params["radius"]) + 1, radius=2.0)
+def blur(pixels, radius):
+    """
+    Gaussian blur; radius is the standard deviation in pixels.
+    """
+    return gaussian_blur(pixels, radius)
+
+
+@filter_plugin("sharpen", "neighborhood", halo=lambda params: gaussian_radius(params["radius"]) + 1,
+               radius=1.5, amount=1.0)
+def sharpen(pixels, radius, amount):
+    """
+    Unsharp mask: adds amount times the difference between the image and a Gaussian blur of it.
+    """
+    blurred = gaussian_blur(pixels, radius)
+    if cv2 is not None:
+        return cv2.addWeighted(pixels, 1 + amount, blurred, -amount, 0)  # Saturates to 0-255 itself
+    return pixels * np.float32(1 + amount) - blurred * np.float32(amount)
+
+
+@filter_plugin("edges", "neighborhood", label="Find Edges", halo=2)
+def edges(pixels):
+    """
+    Sobel edge strength per channel: bright where the image changes quickly, dark where it is flat.
+    """
+    if cv2 is not None:
+        dx = cv2.Sobel(pixels, cv2.CV_16S, 1, 0, borderType=cv2.BORDER_REFLECT_101)
+        dy = cv2.Sobel(pixels, cv2.CV_16S, 0, 1, borderType=cv2.BORDER_REFLECT_101)
+        return cv2.addWeighted(cv2.convertScaleAbs(dx), 0.5, cv2.convertScaleAbs(dy), 0.5, 0)
+    pad = [(1, 1), (1, 1)] + [(0, 0)] * (pixels.ndim - 2)
+    padded = np.pad(pixels.astype(np.int16), pad, mode="reflect")
+    # Sobel = smoothing [1, 2, 1] across the direction of the derivative [-1, 0, 1]
+    rows = padded[:-2] + 2 * padded[1:-1] + padded[2:]
+    columns = padded[:, :-2] + 2 * padded[:, 1:-1] + padded[:, 2:]
+    dx = rows[:, 2:] - rows[:, :-2]
+    dy = columns[2:] - columns[:-2]
+    return (np.minimum(np.abs(dx), 255) + np.minimum(np.abs(dy), 255)) / 2
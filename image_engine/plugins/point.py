@@ -0,0 +1,35 @@
+# ==================================================
+# Point Filters: each output pixel depends only on the same input pixel
+# ==================================================
+import numpy as np
+
+from ..backends import cv2
+from ..filters import filter_plugin
+
+# Sepia tone matrix (rows: output R, G, B; columns: input R, G, B)
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131],
+], np.float32)
+
+
+@filter_plugin("sepia", "point")
+def sepia(pixels):
+    """
+    Warm brown tone: each colour is a weighted mix of the input's red, green and blue. Grayscale images are unchanged.
+    """
+    if pixels.ndim == 2:
+        return pixels
+    if cv2 is not None:
+        return cv2.transform(pixels, SEPIA_MATRIX)  # Saturates to 0-255 itself
+    return pixels.astype(np.float32) @ SEPIA_MATRIX.T
+
+
+@filter_plugin("posterize", "point", per_channel=True, levels=4)
+def posterize(values, levels):
+    """
+    Reduces each channel to the given number of evenly spaced levels.
+    """
+    step = 255 / max(1, levels - 1)
+    return np.rint(values / step) * step
@@ -0,0 +1,78 @@
+# ==================================================
+# Point Operations: per-pixel adjustments fused into one lookup table
+# ==================================================
+
+# Registry of point operations: name -> function(value, **params) mapping a 0-255 input value to an output value
+POINT_OPERATIONS = {}
+
+
+def point_operation(name):
+    """
+    Registers a point operation under the given name.
+    - The function maps one channel value (0-255) to a new value; results are truncated and clipped to 0-255.
+    """
+    def register(func):
+        POINT_OPERATIONS[name] = func
+        return func
+    return register
+
+
+@point_operation("brightness")
+def brightness(value, factor):
+    """
+    Scales towards black (factor < 1) or brighter (factor > 1), like ImageEnhance.Brightness.
+    """
+    return value * factor
+
+
+@point_operation("contrast")
+def contrast(value, factor):
+    """
+    Scales the distance from mid-grey (128) by factor.
+    """
+    return 128 + (value - 128) * factor
+
+
+@point_operation("gamma")
+def gamma(value, gamma):
+    """
+    Applies gamma correction; values above 1 brighten the mid-tones.
+    """
+    return 255 * (value / 255) ** (1 / gamma) + 0.5
+
+
+@point_operation("levels")
+def levels(value, black=0, white=255):
+    """
+    Stretches the input range black..white to the full 0-255 range.
+    """
+    return (value - black) * 255 / max(1, white - black) + 0.5
+
+
+@point_operation("invert")
+def invert(value, enabled=True):
+    """
+    Inverts the value (a negative image).
+    """
+    return 255 - value if enabled else value
+
+
+def build_table(name, params):
+    """
+    Tabulates one point operation as a 256-entry lookup table.
+    """
+    func = POINT_OPERATIONS[name]
+    return [min(255, max(0, int(func(value, **params)))) for value in range(256)]
+
+
+def compile_lut(steps):
+    """
+    Composes a chain of point operations into a single 256-entry lookup table.
+    - steps: A list of (name, params) applied in order.
+    - The result is identical to applying each operation's table in turn, but the image is only visited once.
+    """
+    lut = list(range(256))
+    for name, params in steps:
+        table = build_table(name, params)
+        lut = [table[value] for value in lut]
+    return lut
@@ -0,0 +1,101 @@
+# ==================================================
+# Image Pyramid: cheap display-sized versions of large images
+# ==================================================
+from collections import OrderedDict
+
+from PIL import Image
+
+from .backends import get_backend
+from .engine import fit_size
+from .tracing import span
+
+MAX_CACHED_FITS = 4  # Number of recent fitted images kept per pyramid
+
+
+class ImagePyramid:
+    """
+    A multi-resolution pyramid of an image for fast display at any size.
+    - Level 0 is the image itself; each following level is half the size of the one before, built with Image.reduce(2).
+    - Levels are built lazily, the first time a display size needs them.
+    - image: The full-resolution PIL image.
+    """
+
+    def __init__(self, image):
+        if image.mode in ("P", "1"):
+            # Reduce and LANCZOS do not work on palette/bilevel data; display it as RGB(A) instead
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        self.levels = [image]
+        self.fits = OrderedDict()  # (width, height, resample) -> fitted image
+
+    @property
+    def size(self):
+        """
+        The (width, height) of the full-resolution image.
+        """
+        return self.levels[0].size
+
+    def level(self, index):
+        """
+        Returns pyramid level `index`, building any missing levels on the way.
+        """
+        while len(self.levels) <= index:
+            previous = self.levels[-1]
+            if previous.width < 2 or previous.height < 2:
+                break
+            with span("resample.reduce", "resample", previous, level=len(self.levels)):
+                self.levels.append(previous.reduce(2))
+        return self.levels[min(index, len(self.levels) - 1)]
+
+    def level_for(self, size):
+        """
+        Returns the smallest level that is still at least as large as the requested (width, height).
+        """
+        index = 0
+        while True:
+            next_level = self.level(index + 1)
+            if next_level is self.levels[index] or next_level.width < size[0] or next_level.height < size[1]:
+                return self.levels[index]
+            index += 1
+
+    def resize(self, size, resample=Image.LANCZOS):
+        """
+        Produces the image at the given (width, height) by resampling from the cheapest suitable level.
+        - Recent results are cached, so asking for the same size again costs nothing.
+        """
+        key = (size[0], size[1], resample)
+        if key in self.fits:
+            self.fits.move_to_end(key)
+            return self.fits[key]
+
+        source = self.level_for(size)
+        if source.size == tuple(size):
+            result = source
+        elif resample == Image.LANCZOS:
+            result = get_backend().resize(source, size)
+        else:
+            with span("resample.resize", "resample", source, backend="pillow", out_width=size[0], out_height=size[1]):
+                result = source.resize(size, resample)
+
+        self.fits[key] = result
+        if len(self.fits) > MAX_CACHED_FITS:
+            self.fits.popitem(last=False)
+        return result
+
+    def crop(self, box, full_size):
+        """
+        Cuts a region out of level 0 without decoding anything, e.g. for a quick preview of a crop.
+        - box: The (left, upper, right, lower) region in full-resolution coordinates.
+        - full_size: The (width, height) of the full-resolution image (level 0 may be a smaller preview).
+        """
+        scale_x = self.size[0] / full_size[0]
+        scale_y = self.size[1] / full_size[1]
+        left, upper = int(box[0] * scale_x), int(box[1] * scale_y)
+        right = max(left + 1, round(box[2] * scale_x))
+        lower = max(upper + 1, round(box[3] * scale_y))
+        return self.levels[0].crop((left, upper, right, lower))
+
+    def fit(self, max_width, max_height, resample=Image.LANCZOS):
+        """
+        Produces the image scaled to fit within the given dimensions while maintaining its aspect ratio.
+        """
+        return self.resize(fit_size(self.size, max_width, max_height), resample)
@@ -0,0 +1,131 @@
+# ==================================================
+# Saving: encoder presets and atomic writes
+# ==================================================
+import os
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+from .tracing import span
+
+# Encoder options per preset and format
+# - fast: Least CPU time; larger files.
+# - balanced: The editor's long-standing defaults (JPEG quality 95, PNG level 6).
+# - small: Smallest files; PNG and WebP take several times longer to encode.
+SAVE_PRESETS = {
+    "fast": {
+        "PNG": {"compress_level": 1},
+        "JPEG": {"quality": 90, "subsampling": "4:2:0"},
+        "WEBP": {"quality": 85, "method": 0},
+    },
+    "balanced": {
+        "PNG": {"compress_level": 6},
+        "JPEG": {"quality": 95},
+        "WEBP": {"quality": 90, "method": 4},
+    },
+    "small": {
+        "PNG": {"compress_level": 9, "optimize": True},
+        "JPEG": {"quality": 85, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+        "WEBP": {"quality": 80, "method": 6},
+    },
+}
+DEFAULT_SAVE_PRESET = "balanced"
+
+# Modes each format can store; anything else is converted first
+FORMAT_MODES = {
+    "JPEG": ("L", "RGB", "CMYK"),
+    "WEBP": ("RGB", "RGBA"),
+    "BMP": ("1", "L", "P", "RGB", "RGBA"),
+}
+
+# Temporary files are created private (0600); saved files get the permissions a normal open() would give them
+_umask_lock = threading.Lock()
+
+
+def _current_umask():
+    """
+    Returns the process umask, read when a file is saved so a umask changed after import is respected.
+    - On Linux it is read from /proc without changing it. Elsewhere os.umask has to set it to read it, which is
+      done under a lock and restored straight away.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    with _umask_lock:
+        umask = os.umask(0o077)  # Anything created by another thread meanwhile is private, not world-writable
+        os.umask(umask)
+    return umask
+
+
+def format_for_path(path):
+    """
+    Returns the Pillow format name (e.g. "PNG") for a file path's extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    fmt = Image.registered_extensions().get(extension)
+    if fmt is None:
+        raise ValueError(f"Unknown image file extension: {extension or path}")
+    return fmt
+
+
+def prepare_for_format(image, fmt):
+    """
+    Converts an image to a mode the format can store (e.g. drops the padding band of RGBX, or alpha for JPEG).
+    """
+    modes = FORMAT_MODES.get(fmt)
+    if image.mode == "RGBX":
+        image = image.convert("RGB")  # Array-backed RGB images carry a padding byte most encoders do not accept
+    if modes is None or image.mode in modes:
+        return image
+    if "A" in image.getbands() or "transparency" in image.info:
+        return image.convert("RGBA" if "RGBA" in modes else "RGB")
+    return image.convert("L" if image.mode in ("1", "L", "LA", "I", "F") and "L" in modes else "RGB")
+
+
+def encoder_options(fmt, preset=DEFAULT_SAVE_PRESET, **options):
+    """
+    Returns the keyword arguments for Image.save: the preset's settings for the format, overridden by options.
+    """
+    if preset not in SAVE_PRESETS:
+        raise ValueError(f"Unknown save preset: {preset}")
+    merged = dict(SAVE_PRESETS[preset].get(fmt, {}))
+    merged.update(options)
+    return merged
+
+
+def save_image(image, path, preset=DEFAULT_SAVE_PRESET, **options):
+    """
+    Saves an image to the given path; the format is chosen from the file extension.
+    - The image is encoded into a temporary file next to the target, which then replaces the target in one step,
+      so a failed or interrupted save never leaves a half-written file.
+    - preset: "fast", "balanced" or "small" (see SAVE_PRESETS).
+    - options: Encoder settings that override the preset (e.g. quality=80, compress_level=3).
+    - Returns: A dict with the path, format, bytes written and encode time in milliseconds.
+    """
+    fmt = format_for_path(path)
+    params = encoder_options(fmt, preset, **options)
+    directory = os.path.dirname(os.path.abspath(path))
+
+    with span("encode.save", "encode", image, format=fmt, preset=preset) as trace:
+        start = time.perf_counter()
+        image = prepare_for_format(image, fmt)
+        handle, temp_path = tempfile.mkstemp(prefix=".saving-", suffix=os.path.splitext(path)[1], dir=directory)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                image.save(temp_file, fmt, **params)
+            os.chmod(temp_path, 0o666 & ~_current_umask())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        encode_ms = (time.perf_counter() - start) * 1000
+        nbytes = os.path.getsize(path)
+        trace.annotate(bytes=nbytes)
+
+    return {"path": path, "format": fmt, "preset": preset, "bytes": nbytes, "encode_ms": encode_ms}
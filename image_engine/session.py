@@ -0,0 +1,133 @@
+# ==================================================
+# Edit Sessions: save and restore a crop window's work
+# ==================================================
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from PIL import Image
+
+from .engine import OPERATIONS, EditEngine
+from .loader import SourceImage
+
+SESSION_VERSION = 1
+SESSION_EXTENSION = ".g37session"
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+class SessionError(Exception):
+    """
+    Raised when a session file cannot be restored (unknown version or edit, or the source image is missing or
+    changed).
+    """
+
+
+def file_hash(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _png_bytes(image):
+    """
+    Encodes an image as PNG for the session archive (RGBX is stored as RGB).
+    """
+    if image.mode == "RGBX":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=6)
+    return buffer.getvalue()
+
+
+def save_session(path, engine, source_path, crop_box):
+    """
+    Saves an edit session to a zip archive so it can be reopened later.
+    - Stores the source image's path and SHA-256 hash, the crop box, the edit log with the undo/redo position, and the
+      history's keyframes plus the current result as PNG intermediates.
+    - The archive is written to a temporary file and renamed into place.
+    - engine: The EditEngine of the session; call this from the thread that runs its edits.
+    - Returns: The number of bytes written.
+    """
+    history = engine.history
+    intermediates = {position: history.keyframe(position) for position in list(history.keyframes) if position > 0}
+    intermediates[history.cursor] = engine.image
+    if history.cursor == 0:
+        intermediates.pop(0)  # The current result is just the source, which is rebuilt from the image file
+
+    manifest = {
+        "version": SESSION_VERSION,
+        "source": {"path": os.path.abspath(source_path), "sha256": file_hash(source_path),
+                   "size": os.path.getsize(source_path)},
+        "crop_box": list(crop_box),
+        "edits": [[name, params] for name, params in history.entries],
+        "cursor": history.cursor,
+        "intermediates": {str(position): f"intermediates/{position}.png" for position in sorted(intermediates)},
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(prefix=".session-", suffix=SESSION_EXTENSION, dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as temp_file, zipfile.ZipFile(temp_file, "w") as archive:
+            archive.writestr("session.json", json.dumps(manifest, indent=2), zipfile.ZIP_DEFLATED)
+            for position, image in intermediates.items():
+                # PNG is already compressed, so it is stored as it is
+                archive.writestr(manifest["intermediates"][str(position)], _png_bytes(image), zipfile.ZIP_STORED)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def read_session(path):
+    """
+    Reads a session file's manifest (the JSON part) without loading any images.
+    """
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read("session.json"))
+    if manifest.get("version") != SESSION_VERSION:
+        raise SessionError(f"Unsupported session version: {manifest.get('version')}")
+    return manifest
+
+
+def restore_session(path, source_path=None, memory=None):
+    """
+    Reopens a saved session in one step: the current result and keyframes are read from the archive, so no edits are
+    replayed.
+    - source_path: Where the source image is now, if it has moved since the session was saved.
+    - memory: Optional MemoryManager for the restored EditEngine.
+    - Returns: (engine, source_path, crop_box) with the EditEngine at the saved undo/redo position.
+    """
+    manifest = read_session(path)
+    source_info = manifest["source"]
+    source_path = source_path or source_info["path"]
+    if not os.path.exists(source_path):
+        raise SessionError(f"Source image not found: {source_path}")
+    if os.path.getsize(source_path) != source_info["size"] or file_hash(source_path) != source_info["sha256"]:
+        raise SessionError(f"Source image has changed since the session was saved: {source_path}")
+
+    crop_box = tuple(manifest["crop_box"])
+    engine = EditEngine(SourceImage(source_path).crop(crop_box), memory=memory)
+
+    keyframes = {}
+    with zipfile.ZipFile(path) as archive:
+        for position, name in manifest["intermediates"].items():
+            with archive.open(name) as image_file:
+                image = Image.open(image_file)
+                image.load()
+            keyframes[int(position)] = image
+
+    entries = [(name, params) for name, params in manifest["edits"]]
+    unknown = sorted({name for name, params in entries} - set(OPERATIONS))
+    if unknown:
+        raise SessionError(f"Unknown edit operations in session: {', '.join(unknown)}")
+    engine.restore(entries, manifest["cursor"], keyframes)
+    return engine, source_path, crop_box
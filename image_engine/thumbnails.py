@@ -0,0 +1,172 @@
+# ==================================================
+# Thumbnails: parallel generation with a persistent disk cache
+# ==================================================
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+THUMBNAIL_SIZE = 128                                # Longest side of a thumbnail, in pixels
+THUMBNAIL_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+THUMBNAIL_DIR_ENV_VAR = "G37_THUMBNAIL_DIR"         # Overrides where the thumbnail cache is kept
+THUMBNAIL_CACHE_ENV_VAR = "G37_THUMBNAIL_CACHE_MB"  # Overrides the thumbnail cache's size limit, in megabytes
+DEFAULT_THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024   # About 30,000 thumbnails
+HASH_CHUNK_BYTES = 64 * 1024                        # Bytes read from each end of a file to fingerprint its content
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def default_thumbnail_dir():
+    """
+    The thumbnail cache folder: G37_THUMBNAIL_DIR, or g37-image-editor/thumbnails in the user's cache directory.
+    """
+    if os.environ.get(THUMBNAIL_DIR_ENV_VAR):
+        return os.environ[THUMBNAIL_DIR_ENV_VAR]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "g37-image-editor", "thumbnails")
+
+
+def list_images(folder):
+    """
+    Lists the image files in a folder (not its subfolders), sorted by name.
+    """
+    with os.scandir(folder) as entries:
+        paths = [entry.path for entry in entries
+                 if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS]
+    return sorted(paths, key=lambda path: os.path.basename(path).lower())
+
+
+def thumbnail_key(path):
+    """
+    Identifies a file's content for the thumbnail cache: a hash of its size and first and last 64 KB, plus its
+    modification time.
+    - Reading only the ends keeps this fast for large photos; together with the size it tells edited files apart.
+    - A copied or moved file with the same content and modification time shares the cached thumbnail.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1(str(stat.st_size).encode())
+    with open(path, "rb") as image_file:
+        digest.update(image_file.read(HASH_CHUNK_BYTES))
+        if stat.st_size > 2 * HASH_CHUNK_BYTES:
+            image_file.seek(-HASH_CHUNK_BYTES, os.SEEK_END)
+            digest.update(image_file.read(HASH_CHUNK_BYTES))
+    return f"{digest.hexdigest()}-{stat.st_mtime_ns}"
+
+
+def thumbnail_path(directory, path, size=THUMBNAIL_SIZE):
+    """
+    Returns where the thumbnail of an image file is (or will be) cached.
+    """
+    key = thumbnail_key(path)
+    return os.path.join(directory, key[:2], f"{key}-{size}.jpg")
+
+
+def make_thumbnail(path, directory, size=THUMBNAIL_SIZE):
+    """
+    Returns the cached thumbnail file for an image, generating it first if needed.
+    - Runs in a worker process. JPEGs are decoded with draft mode at close to the thumbnail size.
+    - The thumbnail is written to a temporary file and renamed into place, so a half-written file is never seen.
+    - Returns: The path of the thumbnail JPEG.
+    """
+    target = thumbnail_path(directory, path, size)
+    if os.path.exists(target):
+        os.utime(target)  # Marks it as recently used, so prune_thumbnails keeps it
+        return target
+
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        image.thumbnail((size, size), Image.BILINEAR, reducing_gap=2.0)
+        thumbnail = image.convert("RGB")
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(prefix=".thumb-", suffix=".jpg", dir=os.path.dirname(target))
+    try:
+        with os.fdopen(handle, "wb") as temp_file:
+            thumbnail.save(temp_file, "JPEG", quality=85)
+        os.replace(temp_path, target)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return target
+
+
+def prune_thumbnails(directory, max_bytes):
+    """
+    Deletes the least recently used files in the thumbnail cache until it holds at most max_bytes.
+    - Thumbnails are marked as used (their modification time is updated) each time they are served from the cache.
+    - Files that disappear meanwhile (e.g. deleted by another editor's prune) are skipped.
+    - Returns: The number of bytes deleted.
+    """
+    files = []
+    for folder, _, names in os.walk(directory):
+        for name in names:
+            file_path = os.path.join(folder, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file_path))
+    excess = sum(size for _, size, _ in files) - max_bytes
+    deleted = 0
+    for _, size, file_path in sorted(files):
+        if deleted >= excess:
+            break
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        deleted += size
+    return deleted
+
+
+class ThumbnailGenerator:
+    """
+    Generates thumbnails in a pool of worker processes, so decoding many photos uses every CPU core.
+    - directory: The thumbnail cache folder; thumbnails persist there between runs.
+    - max_bytes: The cache's size limit (DEFAULT_THUMBNAIL_CACHE_BYTES, or G37_THUMBNAIL_CACHE_MB). It is enforced
+      by prune_thumbnails, run in the pool when the pool starts.
+    - The pool is started on first use and uses "spawn", so workers never inherit the GUI's threads. If a worker
+      process dies, the broken pool is replaced by a new one on the next submit.
+    """
+
+    def __init__(self, directory=None, size=THUMBNAIL_SIZE, max_workers=THUMBNAIL_WORKERS, max_bytes=None):
+        self.directory = directory or default_thumbnail_dir()
+        self.size = size
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes or (int(os.environ.get(THUMBNAIL_CACHE_ENV_VAR, 0)) * 1024 * 1024
+                                       or DEFAULT_THUMBNAIL_CACHE_BYTES)
+        self.pool = None
+        self.pruned = False
+
+    def submit(self, path):
+        """
+        Queues a thumbnail; returns a concurrent.futures Future for the thumbnail file's path.
+        """
+        try:
+            return self._pool().submit(make_thumbnail, path, self.directory, self.size)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed, or out of memory on a huge file); its pool accepts no more work
+            self.shutdown()
+            return self._pool().submit(make_thumbnail, path, self.directory, self.size)
+
+    def _pool(self):
+        """
+        Starts the worker pool if it is not running; the first pool also prunes the cache in the background.
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            if not self.pruned:
+                self.pruned = True
+                self.pool.submit(prune_thumbnails, self.directory, self.max_bytes)
+        return self.pool
+
+    def shutdown(self):
+        """
+        Drops queued thumbnails and stops the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,190 @@
+# ==================================================
+# Tracing: timed spans exported as a Chrome trace
+# ==================================================
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TRACE_ENV_VAR = "G37_TRACE"     # Set to a file path to trace the whole run and write the trace there on exit
+DEFAULT_MAX_EVENTS = 100_000    # Oldest events are dropped beyond this, so a long session cannot grow without bound
+
+
+def image_args(image):
+    """
+    Describes an image (PIL image or ImageArray) for a span: its width, height and mode.
+    """
+    if image is None:
+        return {}
+    width, height = image.size
+    return {"width": width, "height": height, "mode": image.mode}
+
+
+class Span:
+    """
+    One timed region of work; use it as a context manager.
+    - annotate() adds details that are only known once the work is done, such as the size of the result.
+    """
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def annotate(self, image=None, **args):
+        """
+        Adds arguments to the span; image records the size and mode of a result as out_width, out_height, out_mode.
+        """
+        for key, value in image_args(image).items():
+            self.args["out_" + key] = value
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        if exc_info[0] is not None:
+            self.args["error"] = exc_info[0].__name__
+        self.tracer.add(self.name, self.category, self.start, end, self.args)
+        return False
+
+
+class _NullSpan:
+    """
+    The span handed out while tracing is off: entering, leaving and annotating it do nothing.
+    """
+    __slots__ = ()
+
+    def annotate(self, image=None, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects spans from any thread and exports them in the Chrome trace-event format (chrome://tracing, Perfetto).
+    - While disabled, span() returns a shared no-op span, so instrumented code costs one call and one check.
+    - max_events: The number of most recent events kept.
+    """
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS):
+        self.enabled = False
+        self.events = deque(maxlen=max_events)  # (name, category, start ns, end ns, thread id, args)
+        self.thread_names = {}
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name, category, image=None, **args):
+        """
+        Returns a span timing the enclosed block.
+        - name: What is being done, e.g. "decode.preview".
+        - category: The kind of work: decode, resample, enhance, convert, draw or encode.
+        - image: The input image; its size and mode are recorded.
+        - args: Any other details to record.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        args.update(image_args(image))
+        return Span(self, name, category, args)
+
+    def add(self, name, category, start, end, args):
+        """
+        Records a finished span (times in perf_counter nanoseconds).
+        """
+        thread = threading.current_thread()
+        self.thread_names.setdefault(thread.ident, thread.name)
+        self.events.append((name, category, start, end, thread.ident, args))
+
+    def clear(self):
+        self.events.clear()
+
+    def summary(self):
+        """
+        Totals per span name: {name: {"count", "total_ms", "max_ms"}}, slowest first.
+        """
+        totals = {}
+        for name, category, start, end, thread_id, args in list(self.events):
+            entry = totals.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            duration = (end - start) / 1e6
+            entry["count"] += 1
+            entry["total_ms"] += duration
+            entry["max_ms"] = max(entry["max_ms"], duration)
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total_ms"]))
+
+    def to_chrome(self):
+        """
+        Returns the recorded spans as a Chrome trace-event JSON object.
+        """
+        pid = os.getpid()
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}}
+            for thread_id, thread_name in self.thread_names.items()
+        ]
+        for name, category, start, end, thread_id, args in list(self.events):
+            trace_events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",  # Complete event: a start time and a duration
+                "ts": (start - self.origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": pid,
+                "tid": thread_id,
+                "args": args,
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        """
+        Writes the trace to a JSON file that chrome://tracing or ui.perfetto.dev can open.
+        """
+        with open(path, "w") as trace_file:
+            json.dump(self.to_chrome(), trace_file)
+
+
+TRACER = Tracer()
+
+
+def span(name, category, image=None, **args):
+    """
+    Times the enclosed block on the global tracer; see Tracer.span.
+    """
+    if not TRACER.enabled:
+        return NULL_SPAN
+    return TRACER.span(name, category, image, **args)
+
+
+def enable_tracing(export_path=None):
+    """
+    Turns tracing on for the whole process.
+    - export_path: Optional file the trace is written to when the program exits.
+    """
+    TRACER.enabled = True
+    if export_path:
+        atexit.register(TRACER.export, export_path)
+    return TRACER
+
+
+def disable_tracing():
+    TRACER.enabled = False
+
+
+def export_trace(path):
+    TRACER.export(path)
+
+
+if os.environ.get(TRACE_ENV_VAR):
+    enable_tracing(os.environ[TRACE_ENV_VAR])
@@ -0,0 +1,208 @@
+# ==================================================
+# Tiled Viewport: zoom, pan and per-tile rendering
+# ==================================================
+import math
+
+from PIL import Image
+
+from .cache import LRUCache
+from .tracing import span
+
+DEFAULT_TILE_SIZE = 256                     # Tiles are square, in display pixels
+DEFAULT_TILE_CACHE_BYTES = 64 * 1024 * 1024  # Memory for rendered tiles
+MAX_ZOOM = 8.0                               # Display pixels per source pixel
+QUALITY_RESAMPLE = Image.LANCZOS  # Filter for the settled view
+FAST_RESAMPLE = Image.BILINEAR    # Filter while the view is changing quickly (e.g. during a window resize)
+RESIZE_SETTLE_MS = 200            # Quiet time after the last resize before re-rendering at full quality
+
+
+def display_size(image_size, zoom):
+    """
+    The (width, height) of an image of the given size when shown at the given zoom.
+    """
+    return max(1, round(image_size[0] * zoom)), max(1, round(image_size[1] * zoom))
+
+
+class Viewport:
+    """
+    Maps between canvas coordinates and full-resolution image coordinates for a zoomed and panned view.
+    - image_size: The (width, height) of the full-resolution image.
+    - canvas_size: The (width, height) of the canvas.
+    - zoom is in display pixels per source pixel; (offset_x, offset_y) is where the image's top-left corner is on the canvas.
+    """
+
+    def __init__(self, image_size, canvas_size):
+        self.image_size = image_size
+        self.canvas_size = canvas_size
+        self.zoom = 1.0
+        self.offset_x = self.offset_y = 0
+        self.fit()
+
+    @property
+    def fit_zoom(self):
+        """
+        The zoom at which the whole image fits on the canvas.
+        """
+        return min(self.canvas_size[0] / self.image_size[0], self.canvas_size[1] / self.image_size[1])
+
+    @property
+    def display_size(self):
+        return display_size(self.image_size, self.zoom)
+
+    def fit(self, canvas_size=None):
+        """
+        Zooms so the whole image fits on the canvas, centred.
+        - canvas_size: The new canvas (width, height), if it has changed.
+        """
+        if canvas_size:
+            self.canvas_size = canvas_size
+        self.zoom = self.fit_zoom
+        self.center()
+
+    def resize_canvas(self, canvas_size):
+        """
+        Adapts the view to a new canvas size.
+        - An image that was fitted is fitted again; otherwise the zoom is kept and the same point stays in the centre.
+        """
+        fitted = math.isclose(self.zoom, self.fit_zoom)
+        old_width, old_height = self.canvas_size
+        self.canvas_size = canvas_size
+        if fitted:
+            self.fit()
+        else:
+            self.offset_x += (canvas_size[0] - old_width) // 2
+            self.offset_y += (canvas_size[1] - old_height) // 2
+
+    def center(self):
+        """
+        Centres the image on the canvas at the current zoom.
+        """
+        display_width, display_height = self.display_size
+        self.offset_x = (self.canvas_size[0] - display_width) // 2
+        self.offset_y = (self.canvas_size[1] - display_height) // 2
+
+    def zoom_at(self, factor, x, y):
+        """
+        Multiplies the zoom by factor, keeping the image point under the canvas position (x, y) in place.
+        """
+        min_zoom = min(self.fit_zoom, 1.0) / 2
+        zoom = min(MAX_ZOOM, max(min_zoom, self.zoom * factor))
+        image_x = (x - self.offset_x) / self.zoom
+        image_y = (y - self.offset_y) / self.zoom
+        self.zoom = zoom
+        self.offset_x = round(x - image_x * zoom)
+        self.offset_y = round(y - image_y * zoom)
+
+    def pan(self, dx, dy):
+        """
+        Moves the image by (dx, dy) canvas pixels.
+        """
+        self.offset_x += dx
+        self.offset_y += dy
+
+    def canvas_to_image(self, x, y):
+        """
+        Maps a canvas position to full-resolution image coordinates, clamped to the image.
+        """
+        image_x = (x - self.offset_x) / self.zoom
+        image_y = (y - self.offset_y) / self.zoom
+        return (min(self.image_size[0], max(0, image_x)),
+                min(self.image_size[1], max(0, image_y)))
+
+    def image_to_canvas(self, x, y):
+        """
+        Maps full-resolution image coordinates to a canvas position.
+        """
+        return x * self.zoom + self.offset_x, y * self.zoom + self.offset_y
+
+    def crop_box(self, start, end):
+        """
+        Maps a selection drawn on the canvas to a crop box on the full-resolution image.
+        - start, end: The (x, y) canvas coordinates where the selection began and ended.
+        - Returns: The crop box as (left, upper, right, lower).
+        """
+        x1, y1 = self.canvas_to_image(*start)
+        x2, y2 = self.canvas_to_image(*end)
+        return int(min(x1, x2)), int(min(y1, y2)), int(max(x1, x2)), int(max(y1, y2))
+
+    def visible_tiles(self, tile_size=DEFAULT_TILE_SIZE):
+        """
+        Lists the tiles of the zoomed image that overlap the canvas.
+        - Returns: A list of (column, row, canvas_x, canvas_y) for each visible tile.
+        """
+        display_width, display_height = self.display_size
+        left = max(0, -self.offset_x)
+        top = max(0, -self.offset_y)
+        right = min(display_width, self.canvas_size[0] - self.offset_x)
+        bottom = min(display_height, self.canvas_size[1] - self.offset_y)
+        if right <= left or bottom <= top:
+            return []
+        return [(col, row, self.offset_x + col * tile_size, self.offset_y + row * tile_size)
+                for row in range(top // tile_size, math.ceil(bottom / tile_size))
+                for col in range(left // tile_size, math.ceil(right / tile_size))]
+
+
+class TileRenderer:
+    """
+    Renders tiles of an image at any zoom from its pyramid, caching the results.
+    - pyramid: The ImagePyramid to render from. Its level 0 may be a reduced preview of the full image.
+    - full_size: The (width, height) of the full-resolution image that zoom is relative to.
+    - convert: Optional function applied to each rendered PIL tile before caching (e.g. ImageTk.PhotoImage).
+    - cache_bytes: Memory budget for cached tiles.
+    """
+
+    def __init__(self, pyramid, full_size, tile_size=DEFAULT_TILE_SIZE, convert=None,
+                 cache_bytes=DEFAULT_TILE_CACHE_BYTES):
+        self.pyramid = pyramid
+        self.full_size = full_size
+        self.tile_size = tile_size
+        self.convert = convert
+        self.cache = LRUCache(cache_bytes)
+
+    @property
+    def base_scale(self):
+        """
+        Pyramid level 0 pixels per full-resolution pixel (1.0 unless level 0 is a preview).
+        """
+        return self.pyramid.size[0] / self.full_size[0]
+
+    def needs_full_resolution(self, zoom):
+        """
+        True if showing the given zoom sharply needs more detail than the pyramid has.
+        """
+        return zoom > self.base_scale * 1.001
+
+    def render(self, zoom, col, row, resample=QUALITY_RESAMPLE):
+        """
+        Renders one tile as a PIL image, resampling only the matching region of the cheapest pyramid level.
+        """
+        display_width, display_height = display_size(self.full_size, zoom)
+        left, top = col * self.tile_size, row * self.tile_size
+        right = min(display_width, left + self.tile_size)
+        bottom = min(display_height, top + self.tile_size)
+
+        level = self.pyramid.level_for((display_width, display_height))
+        scale_x = level.width / display_width
+        scale_y = level.height / display_height
+        box = (left * scale_x, top * scale_y, right * scale_x, bottom * scale_y)
+        with span("resample.tile", "resample", level, zoom=zoom, col=col, row=row):
+            return level.resize((right - left, bottom - top), resample, box=box)
+
+    def tile(self, zoom, col, row, resample=QUALITY_RESAMPLE):
+        """
+        Returns a tile from the cache, rendering (and converting) it on a miss.
+        - A faster filter only renders when no full-quality tile is cached for the same place.
+        """
+        if resample != QUALITY_RESAMPLE and (zoom, col, row, QUALITY_RESAMPLE) in self.cache:
+            resample = QUALITY_RESAMPLE
+        key = (zoom, col, row, resample)
+        tile = self.cache.get(key)
+        if tile is None:
+            image = self.render(zoom, col, row, resample)
+            if self.convert:
+                with span("convert.tile", "convert", image):
+                    tile = self.convert(image)
+            else:
+                tile = image
+            self.cache.put(key, tile, size=image.width * image.height * 4)
+        return tile